@@ -0,0 +1,103 @@
+"""Asyncio facade for Elemetium elements using the Selenium driver
+
+Selenium's WebDriver is blocking, so every call on a :class:`SeElements` ties
+up the calling thread while it waits on the driver. :class:`AsyncSeElements`
+runs those calls in an executor instead, so an event loop can drive several
+browser sessions concurrently::
+
+    elements = AsyncSeElements(SeElements(browser))
+    await elements.navigate('http://example.com')
+    heading = await elements.find('h1')
+    text = await heading.text()
+
+:class:`AsyncSeElements` requires Python 3.
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import functools
+
+from elementium.drivers.se import SeElements
+
+
+class AsyncSeElements(object):
+    """Run the methods of a :class:`SeElements` in an executor
+
+    Any method of the wrapped :class:`SeElements` can be called and returns an
+    awaitable for its result. Methods returning a new :class:`SeElements`
+    (e.g. ``find()``) resolve to an :class:`AsyncSeElements` wrapping it, so
+    that calls can be chained.
+
+    Other attributes (e.g. ``items``) and ``len()`` are read directly. The
+    items of the returned :class:`SeElements` are fetched in the executor
+    before the awaitable resolves, so reading them doesn't block the event
+    loop. If the items are thrown away again (e.g. with ``invalidate()``),
+    await ``update()`` before reading them.
+    """
+
+    def __init__(self, elements, executor=None, loop=None):
+        """Create a new facade
+
+        :param elements: The :class:`SeElements` to wrap
+        :param executor: The :class:`concurrent.futures.Executor` to run the
+                         calls in. By default the loop's default executor is
+                         used.
+        :param loop: The event loop to use. By default the current event loop.
+        """
+        self.elements = elements
+        self.executor = executor
+        self.loop = loop
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __getitem__(self, i):
+        return self._wrap(self.elements[i])
+
+    def __getattr__(self, name):
+        attr = getattr(self.elements, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def method(*args, **kwargs):
+            return self.run_sync(attr, *args, **kwargs)
+        return method
+
+    def _wrap(self, result):
+        """Wrap a result in an :class:`AsyncSeElements` if needed"""
+        if isinstance(result, SeElements):
+            return AsyncSeElements(
+                result, executor=self.executor, loop=self.loop)
+        return result
+
+    def run_sync(self, fn, *args, **kwargs):
+        """Run a blocking function in the executor
+
+        :param fn: The function to call
+        :returns: An awaitable for the (wrapped) result of calling :attr:`fn`
+        """
+        loop = self.loop or asyncio.get_event_loop()
+        # loop.create_future() needs Python 3.5.2
+        result = asyncio.Future(loop=loop)
+
+        def call():
+            value = fn(*args, **kwargs)
+            if isinstance(value, SeElements):
+                # Fetch the items here rather than on the event loop
+                value.items
+            return value
+
+        def done(future):
+            if result.cancelled():
+                return
+            if future.cancelled():
+                result.cancel()
+            elif future.exception() is not None:
+                result.set_exception(future.exception())
+            else:
+                result.set_result(self._wrap(future.result()))
+
+        loop.run_in_executor(self.executor, call).add_done_callback(done)
+        return result
@@ -2,19 +2,39 @@
 
 from __future__ import absolute_import
 
-import time
-
-from selenium.common.exceptions import WebDriverException
+import itertools
+import re
+import six
+import socket
+import warnings
+
+from collections import namedtuple
+
+from selenium.common.exceptions import (
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException
+)
+from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import Select
+from urllib3.exceptions import HTTPError
 
 from elementium.elements import (
     Browser,
     Elements
 )
+from elementium.exc import (
+    ScriptError,
+    TimeOutError
+)
 from elementium.util import (
+    DEFAULT_JITTER,
+    DEFAULT_MAX_PAUSE,
+    DEFAULT_RETRY_PAUSE,
     DEFAULT_SLEEP_TIME,
     DEFAULT_TTL,
-    ignored
+    ignored,
+    monotonic
 )
 from elementium.waiters import (
     ExceptionRetryWaiter,
@@ -25,34 +45,640 @@ __author__ = "Patrick R. Schmid"
 __email__ = "prschmid@act.md"
 
 
+# The query scripts below all take the same first three arguments: the list of
+# parent elements to search in (``null`` meaning the whole document), the
+# selector, and whether or not to only return displayed elements. Running the
+# query for every parent in one script means a single round trip to the
+# browser no matter how many parents there are.
+
+# An approximation of Selenium's isDisplayed atom that is shared by the query
+# scripts: an element is displayed if neither it nor any of its ancestors are
+# hidden via CSS, it (or one of its descendants) takes up some space on the
+# page, and it is not entirely outside of an ancestor that hides its
+# overflow. Like the atom, <option> and <optgroup> elements are displayed if
+# their <select> is. Unlike the atom it does not special case things like
+# <map>, opacity, or position: fixed escaping its ancestors' overflow.
+_IS_DISPLAYED_SCRIPT = """
+function hasSize(el) {
+    var rect = el.getBoundingClientRect();
+    if (rect.width > 0 && rect.height > 0) {
+        return true;
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        if (hasSize(el.children[i])) {
+            return true;
+        }
+    }
+    return false;
+}
+function clips(overflow) {
+    return overflow === 'hidden' || overflow === 'clip';
+}
+function isClipped(el) {
+    var rect = el.getBoundingClientRect();
+    for (var node = el.parentElement; node; node = node.parentElement) {
+        var style = window.getComputedStyle(node);
+        var clipsX = clips(style.overflowX), clipsY = clips(style.overflowY);
+        if (!clipsX && !clipsY) {
+            continue;
+        }
+        var box = node.getBoundingClientRect();
+        if (clipsX && (rect.right <= box.left || rect.left >= box.right)) {
+            return true;
+        }
+        if (clipsY && (rect.bottom <= box.top || rect.top >= box.bottom)) {
+            return true;
+        }
+    }
+    return false;
+}
+function isDisplayed(el) {
+    if (!el) {
+        return false;
+    }
+    var tag = el.tagName.toLowerCase();
+    if (tag === 'option' || tag === 'optgroup') {
+        var select = el.parentElement;
+        while (select && select.tagName.toLowerCase() !== 'select') {
+            select = select.parentElement;
+        }
+        return isDisplayed(select);
+    }
+    var style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.visibility === 'collapse') {
+        return false;
+    }
+    for (var node = el; node && node.nodeType === 1; node = node.parentNode) {
+        if (window.getComputedStyle(node).display === 'none') {
+            return false;
+        }
+    }
+    return hasSize(el) && !isClipped(el);
+}
+"""
+
+_FIND_SCRIPT = _IS_DISPLAYED_SCRIPT + """
+var parents = arguments[0], selector = arguments[1], onlyDisplayed = arguments[2];
+var out = [];
+for (var i = 0; i < parents.length; i++) {
+    var matches = (parents[i] || document).querySelectorAll(selector);
+    for (var j = 0; j < matches.length; j++) {
+        if (!onlyDisplayed || isDisplayed(matches[j])) {
+            out.push(matches[j]);
+        }
+    }
+}
+return out;
+"""
+
+# The batch scripts below take the list of elements to act on as their first
+# argument and return the indexes of the elements that they could not handle
+# with plain DOM calls (e.g. because they are hidden or disabled). Those are
+# then handled one at a time using the regular WebDriver commands, which also
+# raise the appropriate errors if need be.
+_CLICK_SCRIPT = _IS_DISPLAYED_SCRIPT + """
+var elements = arguments[0], failed = [];
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i];
+    if (el.disabled || !isDisplayed(el)) {
+        failed.push(i);
+        continue;
+    }
+    try {
+        el.click();
+    } catch (e) {
+        failed.push(i);
+    }
+}
+return failed;
+"""
+
+# Defines setValue(el, value), which sets the value of a form field the way
+# typing would and fires the input and change events. The value is set with
+# the native setter of the element's prototype, since frameworks like React
+# track the value with a setter on the element itself and ignore changes
+# that go through it.
+_SET_VALUE_SCRIPT = """
+function setValue(el, value) {
+    var proto = Object.getPrototypeOf(el);
+    var descriptor = proto && Object.getOwnPropertyDescriptor(proto, 'value');
+    if (descriptor && descriptor.set) {
+        descriptor.set.call(el, value);
+    } else {
+        el.value = value;
+    }
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+"""
+
+# Takes the text to append to each element as its second argument. Passing
+# an empty string with ``clear`` set (the third argument) clears the elements.
+# Only textareas and text-like inputs are handled this way; anything else
+# (selects, checkboxes, buttons, ...) or text that wouldn't fit the maxlength
+# is left to send_keys()/clear().
+_WRITE_SCRIPT = _IS_DISPLAYED_SCRIPT + _SET_VALUE_SCRIPT + """
+var elements = arguments[0], text = arguments[1], clear = arguments[2];
+var textTypes = ['text', 'search', 'email', 'url', 'tel', 'password'];
+var failed = [];
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i];
+    var tag = el.tagName.toLowerCase();
+    var value = clear ? '' : el.value + text;
+    if (!(tag === 'textarea' ||
+                (tag === 'input' && textTypes.indexOf(el.type) >= 0)) ||
+            el.disabled || el.readOnly || !isDisplayed(el) ||
+            (el.maxLength >= 0 && value.length > el.maxLength)) {
+        failed.push(i);
+        continue;
+    }
+    el.focus();
+    setValue(el, value);
+}
+return failed;
+"""
+
+# Takes the list of elements and a selector and returns the closest ancestor
+# (or the element itself) of each element that matches the selector
+_CLOSEST_SCRIPT = """
+var elements = arguments[0], selector = arguments[1], out = [];
+for (var i = 0; i < elements.length; i++) {
+    var node = elements[i];
+    if (!node) {
+        continue;
+    }
+    if (node.closest) {
+        node = node.closest(selector);
+    } else {
+        var matches = node.matches || node.msMatchesSelector;
+        while (node && node.nodeType === 1 && !matches.call(node, selector)) {
+            node = node.parentElement || node.parentNode;
+        }
+        if (node && node.nodeType !== 1) {
+            node = null;
+        }
+    }
+    if (node && out.indexOf(node) < 0) {
+        out.push(node);
+    }
+}
+return out;
+"""
+
+# Takes the list of elements and returns the ones for which the JavaScript
+# expression the template is filled in with is truthy. The expression refers
+# to the element being tested as ``el``.
+_FILTER_SCRIPT_TEMPLATE = """
+var elements = arguments[0], out = [];
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i];
+    if (el && (%s)) {
+        out.push(el);
+    }
+}
+return out;
+"""
+
+# Takes the list of elements and returns the result of running the body of
+# the function the template is filled in with for each of them. The body
+# refers to the element as ``el``.
+_BATCH_SCRIPT_TEMPLATE = """
+var elements = arguments[0], out = [];
+function run(el) {
+%s
+}
+for (var i = 0; i < elements.length; i++) {
+    out.push(run(elements[i]));
+}
+return out;
+"""
+
+# Runs a list of chain() steps in the browser. Takes the root to resolve the
+# selectors of the steps against, the steps, and the number of milliseconds
+# to wait for 'wait-visible' steps. When run asynchronously the last argument
+# is the callback to hand the outcome to.
+_CHAIN_SCRIPT = _IS_DISPLAYED_SCRIPT + _SET_VALUE_SCRIPT + """
+var root = arguments[0] || document, steps = arguments[1];
+var timeout = arguments[2], done = arguments[3], results = [];
+function first(selector) {
+    var el = root.querySelector(selector);
+    if (!el) {
+        throw new Error('No element matches ' + selector);
+    }
+    return el;
+}
+function write(el, value) {
+    el.focus();
+    setValue(el, value);
+}
+var ops = {
+    'scroll': function(step) { window.scrollTo(step[1], step[2]); },
+    'js-click': function(step) { first(step[1]).click(); },
+    'js-fill': function(step) { write(first(step[1]), step[2]); },
+    'js-clear': function(step) { write(first(step[1]), ''); },
+    'text': function(step) { return first(step[1]).innerText; },
+    'value': function(step) { return first(step[1]).value; },
+    'attribute': function(step) {
+        return first(step[1]).getAttribute(step[2]);
+    }
+};
+function finish(outcome) {
+    if (done) {
+        done(outcome);
+    }
+    return outcome;
+}
+function waitVisible(i) {
+    var selector = steps[i][1], deadline = new Date().getTime() + timeout;
+    (function poll() {
+        var el = root.querySelector(selector);
+        if (el && isDisplayed(el)) {
+            results.push(null);
+            run(i + 1);
+        } else if (new Date().getTime() > deadline) {
+            finish({error: 'Timed out waiting for ' + selector, step: i});
+        } else {
+            setTimeout(poll, 50);
+        }
+    })();
+}
+function run(i) {
+    for (; i < steps.length; i++) {
+        if (steps[i][0] === 'wait-visible') {
+            return waitVisible(i);
+        }
+        try {
+            var result = ops[steps[i][0]](steps[i]);
+            results.push(result === undefined ? null : result);
+        } catch (e) {
+            return finish({error: String(e && e.message || e), step: i});
+        }
+    }
+    return finish({results: results});
+}
+return run(0);
+"""
+
+# The chain() steps that are run in the browser, and the ones that need the
+# driver to perform real user actions
+_CHAIN_SCRIPT_STEPS = frozenset([
+    'scroll', 'js-click', 'js-fill', 'js-clear', 'text', 'value',
+    'attribute', 'wait-visible'])
+_CHAIN_ACTION_STEPS = frozenset(['keys', 'pause'])
+
+# Defines settle(timeout, done), which calls done once the browser has
+# rendered the next two frames (i.e. a layout change has been applied), or
+# after timeout milliseconds, whichever comes first. The timeout matters for
+# pages in the background, which don't get any animation frames.
+_SETTLE_SCRIPT = """
+function settle(timeout, done) {
+    var finished = false;
+    function finish() {
+        if (!finished) {
+            finished = true;
+            done();
+        }
+    }
+    setTimeout(finish, timeout);
+    window.requestAnimationFrame(function() {
+        window.requestAnimationFrame(finish);
+    });
+}
+"""
+
+# Takes a list of elements and a list of names and returns, for each element,
+# the list of the values for those names. "text" and "tag_name" are read like
+# SeElements.text() and tag_name() do; anything else is read as a property,
+# falling back to the attribute of that name.
+_READ_SCRIPT = """
+var elements = arguments[0], names = arguments[1];
+function read(el, name) {
+    if (name === 'text') {
+        return el.innerText;
+    }
+    if (name === 'tag_name') {
+        return el.tagName.toLowerCase();
+    }
+    var value = el[name];
+    if (value === undefined || value === null || typeof value === 'object' ||
+            typeof value === 'function') {
+        value = el.getAttribute(name);
+    }
+    return value;
+}
+var out = [];
+for (var i = 0; i < elements.length; i++) {
+    var values = [];
+    for (var j = 0; j < names.length; j++) {
+        values.push(read(elements[i], names[j]));
+    }
+    out.push(values);
+}
+return out;
+"""
+
+# (De)selects the options of <select> elements. Like the other batch scripts
+# it takes the elements, followed by what to match the options by ("index",
+# "value", "text", or "all"), the index/value/text to match, and whether to
+# select or deselect. The elements it could not handle with plain DOM calls
+# (e.g. no option matches) need to use the regular Select support.
+_SELECT_SCRIPT = """
+var elements = arguments[0], by = arguments[1], match = arguments[2];
+var selected = arguments[3], failed = [];
+function select(el) {
+    if (!el || el.tagName.toLowerCase() !== 'select' || el.disabled ||
+            (!selected && !el.multiple)) {
+        return false;
+    }
+    var matches = [];
+    for (var i = 0; i < el.options.length; i++) {
+        var option = el.options[i];
+        if (by === 'all' ||
+                (by === 'index' && i === match) ||
+                (by === 'value' && option.value === match) ||
+                (by === 'text' &&
+                 option.text.replace(/\\s+/g, ' ').trim() === match)) {
+            if (option.disabled) {
+                return false;
+            }
+            matches.push(option);
+            if (selected && !el.multiple) {
+                break;
+            }
+        }
+    }
+    if (!matches.length && by !== 'all') {
+        return false;
+    }
+    var changed = false;
+    for (var j = 0; j < matches.length; j++) {
+        if (matches[j].selected !== selected) {
+            matches[j].selected = selected;
+            changed = true;
+        }
+    }
+    if (changed) {
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    }
+    return true;
+}
+for (var k = 0; k < elements.length; k++) {
+    if (!select(elements[k])) {
+        failed.push(k);
+    }
+}
+return failed;
+"""
+
+# Scroll the page. Take the x and y positions (either numbers or JavaScript
+# expressions to evaluate), and the maximum number of milliseconds to wait
+# for the page to be rendered at the new position. When run asynchronously
+# the last argument is the callback to call once that is done.
+_SCROLL_SCRIPT_TEMPLATE = _SETTLE_SCRIPT + """
+function position(value) {
+    return typeof value === 'string' ? window.eval(value) : value;
+}
+window.scrollTo(position(arguments[0]), %s);
+if (arguments.length > 3) {
+    settle(arguments[2], arguments[3]);
+}
+"""
+_SCROLL_SCRIPT = _SCROLL_SCRIPT_TEMPLATE % "position(arguments[1])"
+_SCROLL_BOTTOM_SCRIPT = _SCROLL_SCRIPT_TEMPLATE % "document.body.scrollHeight"
+
+# Get a cheap signature of the page: the URL, the title, and a hash of the
+# serialized DOM. Used to avoid transferring the full page source if the page
+# has not changed.
+_SOURCE_SIGNATURE_SCRIPT = """
+var html = document.documentElement ? document.documentElement.outerHTML : '';
+var hash = 0;
+for (var i = 0; i < html.length; i++) {
+    hash = ((hash << 5) - hash + html.charCodeAt(i)) | 0;
+}
+return [document.URL, document.title, html.length, hash].join('|');
+"""
+
+# WebDriver special keys (e.g. Keys.RETURN) live in the unicode private use
+# area and can only be sent as actual key presses
+_SPECIAL_KEYS = re.compile(u'[\ue000-\uf8ff]')
+
+# XPath expressions are compiled once per page with document.createExpression
+# where it is available and the compiled expression is kept in a
+# ``window.__ecache`` Map. It is (re)created on demand since navigating to a
+# new page throws it away, and only keeps the 100 most recently compiled
+# expressions so that it doesn't grow without bound.
+_XPATH_SCRIPT = _IS_DISPLAYED_SCRIPT + """
+var parents = arguments[0], selector = arguments[1], onlyDisplayed = arguments[2];
+var cache = window.__ecache || (window.__ecache = new Map());
+var expression = cache.get(selector);
+if (!expression) {
+    expression = document.createExpression ?
+        document.createExpression(selector, null) : null;
+    if (cache.size >= 100) {
+        cache.delete(cache.keys().next().value);
+    }
+    cache.set(selector, expression);
+}
+var out = [];
+for (var i = 0; i < parents.length; i++) {
+    var root = parents[i] || document;
+    var matches = expression ?
+        expression.evaluate(
+            root, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null) :
+        document.evaluate(
+            selector, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE,
+            null);
+    for (var j = 0; j < matches.snapshotLength; j++) {
+        var match = matches.snapshotItem(j);
+        if (!onlyDisplayed || isDisplayed(match)) {
+            out.push(match);
+        }
+    }
+}
+return out;
+"""
+
+_FIND_LINK_SCRIPT = _IS_DISPLAYED_SCRIPT + """
+var parents = arguments[0], selector = arguments[1], onlyDisplayed = arguments[2];
+var exact = arguments[3];
+var out = [];
+for (var i = 0; i < parents.length; i++) {
+    var links = (parents[i] || document).getElementsByTagName('a');
+    for (var j = 0; j < links.length; j++) {
+        var text = (links[j].innerText || links[j].textContent || '').trim();
+        var matched = exact ? text === selector : text.indexOf(selector) >= 0;
+        if (matched && (!onlyDisplayed || isDisplayed(links[j]))) {
+            out.push(links[j]);
+        }
+    }
+}
+return out;
+"""
+
+# Same as _FIND_SCRIPT, but scrolls the page first. Takes the x and y
+# positions to scroll to (numbers or JavaScript expressions, with ``null``
+# for y meaning the bottom of the page) as its fourth and fifth arguments.
+_SCROLL_AND_FIND_SCRIPT = """
+function position(value) {
+    return typeof value === 'string' ? window.eval(value) : value;
+}
+window.scrollTo(
+    position(arguments[3]),
+    arguments[4] === null ? document.body.scrollHeight : position(arguments[4]));
+""" + _FIND_SCRIPT
+
+
+# Wraps one of the query scripts above so that it is run asynchronously and
+# retried in the browser until it finds something or the number of
+# milliseconds passed as the second to last argument runs out. This saves a
+# round trip to the browser for every retry while waiting for elements.
+_WAIT_SCRIPT_TEMPLATE = """
+var args = Array.prototype.slice.call(arguments, 0, arguments.length - 2);
+var deadline = Date.now() + arguments[arguments.length - 2];
+var done = arguments[arguments.length - 1];
+function query() {
+%s
+}
+function poll(first) {
+    var out;
+    try {
+        out = query.apply(null, args);
+    } catch (e) {
+        if (first) {
+            throw e;
+        }
+        out = [];
+    }
+    if (out.length || Date.now() >= deadline) {
+        done(out);
+    } else {
+        setTimeout(poll, 50);
+    }
+}
+poll(true);
+"""
+
+# The maximum number of seconds a query waits in the browser in one go. This
+# is kept below the default script timeouts of the W3C drivers. If nothing is
+# found by then, or the script times out first (the JSON wire protocol's
+# default script timeout is 0), the query is retried from Python as usual.
+_WAIT_SLICE = 5
+
+
+def _script_parents(elements):
+    """Get the items of the :class:`Elements` in a form scripts can accept
+
+    The browser itself can't be passed to a script, so it is replaced with
+    ``None``, which the query scripts treat as the document.
+
+    :param elements: The :class:`Elements` whose items should be converted
+    :returns: A list of web elements and ``None`` values
+    """
+    browser = elements.browser
+    return [None if item is browser else item for item in elements.items]
+
+
+# Callbacks for the simple getters of SeElements. These are defined once here
+# instead of as closures in each of the methods, since they don't depend on
+# any of the arguments.
+def _is_displayed(elements):
+    return elements.item.is_displayed() if elements.items else False
+
+
+def _is_enabled(elements):
+    return elements.item.is_enabled() if elements.items else False
+
+
+def _is_selected(elements):
+    return elements.item.is_selected() if elements.items else False
+
+
+def _text(elements):
+    return elements.item.text if elements.items else None
+
+
+def _tag_name(elements):
+    return elements.item.tag_name if elements.items else None
+
+
+def _value(elements):
+    return elements.item.get_attribute('value') if elements.items else None
+
+
+def _clear(elements):
+    return elements.item.clear()
+
+
+def _click(elements):
+    return elements.item.click()
+
+
+def _title(elements):
+    return elements.browser.title
+
+
+WindowSize = namedtuple('WindowSize', 'width height')
+"""The size of the browser window in pixels"""
+
+
 class WebDriverExceptionRetryWaiter(ExceptionRetryWaiter):
 
-    def __init__(self, n=0, ttl=DEFAULT_TTL):
+    def __init__(
+            self, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_RETRY_PAUSE,
+            max_pause=DEFAULT_MAX_PAUSE, jitter=DEFAULT_JITTER):
         """Create a new Waiter
 
         :param n: The number of times to retry
         :param ttl: The number of seconds to wait.
+        :param pause: The number of seconds to pause between retries
+        :param max_pause: The maximum number of seconds to pause between
+                          retries
+        :param jitter: The fraction by which each pause is randomly varied
         """
         super(WebDriverExceptionRetryWaiter, self).__init__(
-            WebDriverException, n=n, ttl=ttl)
+            WebDriverException, n=n, ttl=ttl, pause=pause,
+            max_pause=max_pause, jitter=jitter)
 
 
 class WebDriverExceptionRetryElementsWaiter(ExceptionRetryElementsWaiter):
 
-    def __init__(self, elements, n=0, ttl=DEFAULT_TTL):
+    def __init__(
+            self, elements, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_RETRY_PAUSE,
+            max_pause=DEFAULT_MAX_PAUSE, jitter=DEFAULT_JITTER,
+            update_on=None):
         """Create a new Waiter
 
         :param elements: The :class:`Elements` we want to wait on.
         :param n: The number of times to retry
         :param ttl: The number of seconds to wait.
+        :param pause: The number of seconds to pause between retries
+        :param max_pause: The maximum number of seconds to pause between
+                          retries
+        :param jitter: The fraction by which each pause is randomly varied
+        :param update_on: The exception or iterable of exceptions after which
+                          the elements are updated before retrying. By
+                          default this is any :class:`WebDriverException`.
         """
         super(WebDriverExceptionRetryElementsWaiter, self).__init__(
-            elements, WebDriverException, n=n, ttl=ttl)
+            elements, WebDriverException, n=n, ttl=ttl, pause=pause,
+            max_pause=max_pause, jitter=jitter, update_on=update_on)
+
+
+# Errors raised when the driver itself can't be reached, which are worth
+# retrying a page load for (unlike e.g. a page load that timed out)
+_CONNECTION_ERRORS = (socket.error, HTTPError)
+
+# The waiters don't keep any state between calls to wait(), so a single one
+# can be shared by all of the retried calls that don't update the elements
+_RETRY_WAITER = WebDriverExceptionRetryWaiter()
 
 
 class SeElements(Elements, Browser):
     """Elements making use of the Selenium Web Driver."""
 
+    __slots__ = ('_source', '_source_signature')
+
     def __init__(self, browser, context=None, fn=None, config=None, lazy=None):
         """Create a list of elements
 
@@ -61,7 +687,8 @@ class SeElements(Elements, Browser):
                         "parent" set of :class:`Elements` that is giving
                         rise to this set of :class:`Elements`.
         :param fn: The function to call to populate the list of browser
-                   elements this list of :class:`Elements` refers to.
+                   elements this list of :class:`Elements` refers to. If this
+                   is not set, the only item is the :attr:`browser` itself.
         :param config: Optional other configuration details in a dictionary.
                        Valid options are:
 
@@ -71,6 +698,14 @@ class SeElements(Elements, Browser):
                                this will be the default. The default is 20
                                seconds.
                         `lazy`: Whether or not to lazy load the items.
+                        `cache_queries`: Whether or not finds with the same
+                                         arguments return the same
+                                         :class:`Elements` (without querying
+                                         the browser again) until update()
+                                         is called or the page changes. The
+                                         default is ``False``.
+                        `page_load_timeout`: The page load timeout last set
+                                             with set_page_load_timeout().
 
         :param lazy: Whether or not to lazy load the items. If this is ``True``
                      then the :attr:`fn` is evaluated on first access.
@@ -82,6 +717,8 @@ class SeElements(Elements, Browser):
         """
         super(SeElements, self).\
             __init__(browser, context=context, fn=fn, config=config, lazy=lazy)
+        self._source = None
+        self._source_signature = None
 
     def get(self, i):
         """Get the i-th item as an :class:`Elements` object
@@ -93,31 +730,29 @@ class SeElements(Elements, Browser):
         :param i: The index of the item to return
         :returns: The item as an :class:`Elements` object
         """
-        return SeElements(
+        return type(self)(
             self.browser, context=self, fn=lambda context: [context.items[i]],
             config=self.config)
 
-    def retried(self, fn, update=True, ttl=None):
+    def retried(self, fn, update=True, ttl=None, update_on=None):
         """Retry a function for :attr:`ttl` seconds
 
         :param fn: The function to call
         :param update: Whether or not to call update() on self between each
                        retry.
         :param ttl: The number of seconds to retry.
+        :param update_on: The exception or iterable of exceptions after which
+                          to call update() if :attr:`update` is set. By
+                          default this is any :class:`WebDriverException`.
         :returns: The result of running :attr:`fn`
         """
         ttl = ttl if ttl is not None else self.ttl
-        if ttl:
-            if update:
-                return WebDriverExceptionRetryElementsWaiter(self, ttl=ttl).\
-                    wait(fn)
-            else:
-                return WebDriverExceptionRetryWaiter(ttl=ttl).wait(fn)
-        else:
-            if update:
-                return fn(self)
-            else:
-                return fn()
+        if not ttl:
+            return fn(self) if update else fn()
+        if update:
+            return WebDriverExceptionRetryElementsWaiter(
+                self, ttl=ttl, update_on=update_on).wait(fn)
+        return _RETRY_WAITER.wait(fn, ttl=ttl)
 
     def is_displayed(self, ttl=None):
         """Get whether or not the element is visible
@@ -128,9 +763,9 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``True`` if and only if the first element is visible
         """
-        def callback(elements):
-            return elements.item.is_displayed() if elements.items else False
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            _is_displayed, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
 
     def is_enabled(self, ttl=None):
         """Get whether or not the element is enabled
@@ -141,9 +776,9 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``True`` if and only if the first element is enabled
         """
-        def callback(elements):
-            return elements.item.is_enabled() if elements.items else False
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            _is_enabled, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
 
     def is_selected(self, ttl=None):
         """Get whether or not the element is selected
@@ -154,9 +789,9 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``True`` if and only if the first element is select
         """
-        def callback(elements):
-            return elements.item.is_selected() if elements.items else False
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            _is_selected, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
 
     def text(self, ttl=None):
         """Return the text
@@ -167,9 +802,9 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: The text of the first element
         """
-        def callback(elements):
-            return elements.item.text if elements.items else None
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            _text, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
 
     def tag_name(self, ttl=None):
         """Return the tag name
@@ -180,9 +815,9 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: The tag name of the first element
         """
-        def callback(elements):
-            return elements.item.tag_name if elements.items else None
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            _tag_name, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
 
     def value(self, ttl=None):
         """Get the value
@@ -193,10 +828,9 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: The value of the first element
         """
-        def callback(elements):
-            return elements.item.get_attribute('value') \
-                   if elements.items else None
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            _value, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
 
     def attribute(self, name, ttl=None):
         """Get the attribute with the given name
@@ -211,35 +845,158 @@ class SeElements(Elements, Browser):
         def callback(elements):
             return \
                 elements.item.get_attribute(name) if elements.items else None
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(
+            callback, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
+
+    def read(self, *names, **kwargs):
+        """Read several values of the element at once
+
+        This does in a single call to the browser what would otherwise take a
+        call to e.g. :meth:`text`, :meth:`value`, and :meth:`attribute` each::
+
+            text, value, name = elements.read('text', 'value', 'name')
+
+        The name ``text`` returns the rendered text of the element and
+        ``tag_name`` its tag name. Any other name returns the property of the
+        element with that name or, if there is no such property, the
+        attribute with that name. If there are multiple items in this object,
+        the values of the first element will be returned.
+
+        :param names: The names of the values to read
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: A list with the value for each of the :attr:`names`
+        """
+        values = self.read_all(*names, **kwargs)
+        return values[0] if values else [None] * len(names)
+
+    def read_all(self, *names, **kwargs):
+        """Read several values of all of the elements at once
+
+        This is the same as :meth:`read`, but returns the values of every
+        element, still using a single call to the browser::
+
+            for text, href in elements.find('a').read_all('text', 'href'):
+                pass
+
+        :param names: The names of the values to read
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: A list with a list of the values for each of the
+                  :attr:`names` for each of the elements
+        """
+        ttl = kwargs.pop('ttl', None)
+        if kwargs:
+            raise TypeError("Unexpected keyword arguments: {}".format(
+                ', '.join(sorted(kwargs))))
+        names = list(names)
+        def callback(elements):
+            if not elements.items:
+                return []
+            return elements.browser.execute_script(
+                _READ_SCRIPT, elements.items, names)
+        return self.retried(
+            callback, update=True, ttl=ttl,
+            update_on=StaleElementReferenceException)
+
+    def text_all(self, ttl=None):
+        """Return the text of all of the elements in a single call
+
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: A list with the text of each of the elements
+        """
+        return [values[0] for values in self.read_all('text', ttl=ttl)]
+
+    def attribute_all(self, name, ttl=None):
+        """Get the attribute with the given name of all of the elements
+
+        This uses a single call to the browser. As with :meth:`read`, the
+        names ``text`` and ``tag_name`` return the text and tag name.
+
+        :param name: The name of the attribute
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: A list with the attribute of each of the elements
+        """
+        return [values[0] for values in self.read_all(name, ttl=ttl)]
+
+    def _batched(self, script, fn, ttl, *args):
+        """Apply a batch script to all of the items at once
+
+        The script is run with the list of all items as its first argument,
+        followed by the :attr:`args`, and needs to return the indexes of the
+        items it could not handle. :attr:`fn` is then called for each of those
+        as it would be by :meth:`foreach`. If there is only a single item
+        there is nothing to gain by batching and :attr:`fn` is used directly.
+
+        :param script: The JavaScript to run on all of the items
+        :param fn: The function to use for items the script could not handle
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: ``self``
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        if len(self.items) < 2:
+            return self.foreach(fn, ttl=ttl)
+        return self._run_batch_script(script, fn, ttl, *args)
+
+    def _run_batch_script(self, script, fn, ttl, *args):
+        """Apply a batch script to all of the items, whatever their number
+
+        Same as :meth:`_batched`, for scripts that are cheaper than
+        :attr:`fn` even for a single item.
+
+        :param script: The JavaScript to run on all of the items
+        :param fn: The function to use for items the script could not handle
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: ``self``
+        """
+        def callback(elements):
+            if not elements.items:
+                return []
+            return elements.browser.execute_script(
+                script, elements.items, *args)
+        failed = self.retried(callback, update=True, ttl=ttl)
+        for i in failed:
+            self.get(i).retried(fn, update=True, ttl=ttl)
+        return self
 
     def clear(self, ttl=None):
         """Clear the contents of the elements
 
+        If there are multiple elements, any textareas and text inputs among
+        them will all be cleared in a single script in the browser. All other
+        elements are cleared one at a time.
+
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``self``
         """
-        return self.foreach(lambda elements: elements.item.clear(), ttl=ttl)
+        return self._batched(_WRITE_SCRIPT, _clear, ttl, '', True)
 
     def click(self, pause=0, ttl=None):
         """Click the element
 
-        If there are multiple elements, each of the elements will be clicked
+        If there are multiple elements, each of the elements will be clicked.
+        When there is no :attr:`pause` between the clicks, they are all done in
+        a single script in the browser where possible. Such a click is a
+        synthetic ``el.click()``: the element isn't scrolled into view, no
+        mouse events are fired, and a click on an element that is covered
+        (e.g. by an overlay) doesn't raise an error. Pass a :attr:`pause` (or
+        click the elements one at a time) if that matters.
 
         :param pause: The number of seconds to pause between clicks if there
                       are multiple things to click
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``self``
         """
-        return self.foreach(
-            lambda elements: elements.item.click(), pause=pause, ttl=ttl)
+        if pause:
+            return self.foreach(_click, pause=pause, ttl=ttl)
+        return self._batched(_CLICK_SCRIPT, _click, ttl)
 
     def select(self, i=None, value=None, text=None, ttl=None):
         """Select the element
 
-        If there are multiple elements, each of the elements will be selected.
-        At least one of the attributes :attr:`i`, :attr:`value`, or
-        :attr:`text` must be supplied
+        If there are multiple elements, each of the elements will be selected,
+        all in a single script in the browser where possible. At least one of
+        the attributes :attr:`i`, :attr:`value`, or :attr:`text` must be
+        supplied
 
         :param i: The index to select
         :param value: The value to match against
@@ -247,24 +1004,34 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``self``
         """
+        if i is not None:
+            by, match = 'index', i
+        elif value is not None:
+            by, match = 'value', value
+        elif text is not None:
+            by, match = 'text', text
+        else:
+            raise ValueError("i, value, or text must be provided")
+
         def callback(elements):
             s = Select(elements.item)
-            if i is not None:
-                s.select_by_index(i)
-            elif value is not None:
-                s.select_by_value(value)
-            elif text is not None:
-                s.select_by_visible_text(text)
+            if by == 'index':
+                s.select_by_index(match)
+            elif by == 'value':
+                s.select_by_value(match)
             else:
-                raise ValueError("i, value, or text must be provided")
-        return self.foreach(callback, ttl=ttl)
+                s.select_by_visible_text(match)
+        ttl = ttl if ttl is not None else self.ttl
+        return self._run_batch_script(
+            _SELECT_SCRIPT, callback, ttl, by, match, True)
 
     def deselect(self, i=None, value=None, text=None, ttl=None):
         """Select the element
 
         If there are multiple elements, each of the elements will be
-        deselected. If :attr:`i`, :attr:`value`, or :attr:`text` are not
-        supplied, all values will be deselected.
+        deselected, all in a single script in the browser where possible. If
+        :attr:`i`, :attr:`value`, or :attr:`text` are not supplied, all values
+        will be deselected.
 
         :param i: The index to select
         :param value: The value to match against
@@ -272,39 +1039,72 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``self``
         """
+        if i is not None:
+            by, match = 'index', i
+        elif value is not None:
+            by, match = 'value', value
+        elif text is not None:
+            by, match = 'text', text
+        else:
+            by, match = 'all', None
+
         def callback(elements):
             s = Select(elements.item)
-            if i is not None:
-                s.deselect_by_index(i)
-            elif value is not None:
-                s.deselect_by_value(value)
-            elif text is not None:
-                s.deselect_by_visible_text(text)
+            if by == 'index':
+                s.deselect_by_index(match)
+            elif by == 'value':
+                s.deselect_by_value(match)
+            elif by == 'text':
+                s.deselect_by_visible_text(match)
             else:
                 s.deselect_all()
-        return self.foreach(callback, ttl=ttl)
+        ttl = ttl if ttl is not None else self.ttl
+        return self._run_batch_script(
+            _SELECT_SCRIPT, callback, ttl, by, match, False)
 
     def write(self, text, ttl=None):
         """Write text to an element
 
         Instead of just setting the value of an item, this will "write" the
-        text by simulating sending of key press commands.
+        text by simulating sending of key press commands. If there are
+        multiple elements and the text contains no special keys, the text is
+        instead appended to the values of any textareas and text inputs in a
+        single script in the browser (firing only ``input`` and ``change``
+        events, no key events). All other elements are still written to with
+        key presses.
 
         :param text: The text to write
         :param ttl: The minimum number of seconds to keep retrying
         :returns: ``self``
         """
-        return self.foreach(
-            lambda elements: elements.item.send_keys(text), ttl=ttl)
+        fn = lambda elements: elements.item.send_keys(text)
+        if not isinstance(text, six.string_types) or \
+                _SPECIAL_KEYS.search(text):
+            return self.foreach(fn, ttl=ttl)
+        return self._batched(_WRITE_SCRIPT, fn, ttl, text, False)
 
     def closest(self, selector, ttl=None):
         """Find the closest element matching the selector.
 
+        For each element this is the element itself or its nearest ancestor
+        that matches the :attr:`selector`, just like jQuery's ``closest()``.
+
         :param selector: The selector to use
         :param ttl: The minimum number of seconds to keep retrying
         :returns: The closest element matching the :attr:`selector`
         """
-        raise NotImplementedError()
+        ttl = ttl if ttl is not None else self.ttl
+        def inner(elements):
+            items = _script_parents(elements)
+            if not any(items):
+                return []
+            return elements.browser.execute_script(
+                _CLOSEST_SCRIPT, items, selector)
+
+        def callback(elements):
+            return elements.retried(inner, update=True, ttl=ttl)
+        return type(self)(
+            self.browser, context=self, fn=callback, config=self.config)
 
     def parent(self, ttl=None):
         """Get the parent element
@@ -314,8 +1114,170 @@ class SeElements(Elements, Browser):
         """
         def callback(elements):
             return [elements.item.parent] if elements.items else None
-        return SeElements(
+        return type(self)(
+            self.browser, context=self, fn=callback, config=self.config)
+
+    def _query(self, script, selector, only_displayed, wait, ttl, *args):
+        """Run a query script across all of the items in this object
+
+        The items are handed to the script as its first argument, followed by
+        :attr:`selector`, :attr:`only_displayed`, and then any :attr:`args`.
+        The script must return a flat list of the matching web elements.
+
+        Whether or not an element is displayed is decided in the browser by
+        the same script, so it is a close approximation of, but not exactly
+        identical to, what Selenium's ``is_displayed()`` would return.
+
+        :param script: The JavaScript that performs the query
+        :param selector: The selector to use
+        :param only_displayed: Whether or not to only return elements that
+                               are displayed
+        :param wait: Wait until the selector finds at least 1 element
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: An :class:`Elements` object containing the web elements that
+                  match the :attr:`selector`
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        return self._cached_query(
+            (script, selector, only_displayed, wait, ttl) + args,
+            lambda: self._run_query(
+                script, selector, only_displayed, wait, ttl, *args))
+
+    def _run_query(self, script, selector, only_displayed, wait, ttl, *args):
+        """Run a query script without looking at the query cache
+
+        See :meth:`_query` for the parameters.
+        """
+        # Resolve the driver method once instead of on every update()
+        execute = self.browser.execute_script
+
+        def inner(elements):
+            parents = _script_parents(elements)
+            if not parents:
+                return []
+            return execute(script, parents, selector, only_displayed, *args)
+
+        def callback(elements):
+            return elements.retried(inner, update=True, ttl=ttl)
+
+        elements = type(self)(
             self.browser, context=self, fn=callback, config=self.config)
+        if not wait:
+            return elements
+        deadline = monotonic() + ttl
+        if ttl and not len(elements):
+            # Wait for the first matches in the browser once. Any later
+            # update() runs the plain query, so that a legitimately empty
+            # result doesn't block.
+            parents = _script_parents(self)
+            if parents:
+                timeout = int(min(ttl, _WAIT_SLICE) * 1000)
+                with ignored(WebDriverException):
+                    elements._set_items(self.browser.execute_async_script(
+                        _WAIT_SCRIPT_TEMPLATE % script, parents, selector,
+                        only_displayed, *(args + (timeout,))) or [])
+            if len(elements):
+                return elements
+            # Only poll for what is left of the ttl
+            ttl = deadline - monotonic()
+            if ttl <= 0:
+                raise TimeOutError(
+                    "No elements matched {!r}".format(selector))
+        return elements.until(lambda e: len(e) > 0, ttl=ttl)
+
+    def chain(self, steps, ttl=None):
+        """Run several steps with as few round trips to the browser as possible
+
+        Each step is a tuple of the name of the step followed by its
+        arguments. Selectors are resolved against the first element (or the
+        whole page if this is the browser). Consecutive steps that can be
+        done with plain DOM calls are all run in a single script:
+
+            ``('scroll', x, y)``: Scroll the page to the given position
+            ``('js-click', selector)``: Click the first matching element
+            ``('js-fill', selector, value)``: Set the value of the first
+                                              matching element
+            ``('js-clear', selector)``: Clear the first matching element
+            ``('text', selector)``: Get the text of the first matching
+                                    element
+            ``('value', selector)``: Get the value of the first matching
+                                     element
+            ``('attribute', selector, name)``: Get an attribute of the first
+                                               matching element
+            ``('wait-visible', selector)``: Wait up to :attr:`ttl` seconds
+                                            for a matching element to be
+                                            displayed
+
+        Consecutive steps that need real user actions are all sent in a
+        single actions command:
+
+            ``('keys', text)``: Type the text into the focused element
+            ``('pause', seconds)``: Pause before the next action
+
+        Note that the ``js-`` steps are synthetic, so they don't fire exactly
+        the same events as a real user would (e.g. no key or mouse events).
+        Use :meth:`click` and :meth:`write`, or ``keys`` steps, if that
+        matters. Since steps may have side effects, they are not retried.
+
+        If this is not the browser, the steps run in the browser need at
+        least one element to resolve their selectors against.
+
+        :param steps: The list of steps to run
+        :param ttl: The maximum number of seconds to wait for
+                    ``wait-visible`` steps
+        :returns: A list of the results of each of the steps (``None`` for
+                  steps that don't return anything)
+        :raise:
+            :ValueError: If one of the steps is not known
+            :ScriptError: If one of the steps fails in the browser, or there
+                          is no element to run them in
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        for step in steps:
+            if step[0] not in _CHAIN_SCRIPT_STEPS and \
+                    step[0] not in _CHAIN_ACTION_STEPS:
+                raise ValueError("Unknown chain step {!r}".format(step[0]))
+
+        parents = _script_parents(self)
+        if not parents and \
+                any(step[0] in _CHAIN_SCRIPT_STEPS for step in steps):
+            raise ScriptError("Cannot run chain steps without an element")
+        # None is only the first parent if it is the browser (i.e. document)
+        root = parents[0] if parents else None
+        results = []
+        for is_action, group in itertools.groupby(
+                steps, lambda step: step[0] in _CHAIN_ACTION_STEPS):
+            group = [list(step) for step in group]
+            if is_action:
+                actions = ActionChains(self.browser)
+                for step in group:
+                    if step[0] == 'keys':
+                        actions.send_keys(*step[1:])
+                    else:
+                        actions.pause(step[1])
+                actions.perform()
+                results.extend([None] * len(group))
+                continue
+
+            if any(step[0] == 'wait-visible' for step in group):
+                execute = self.browser.execute_async_script
+            else:
+                execute = self.browser.execute_script
+            try:
+                outcome = execute(
+                    _CHAIN_SCRIPT, root, group, int(ttl * 1000))
+            except TimeoutException as e:
+                # The driver's script timeout is shorter than the ttl
+                i = len(results)
+                raise ScriptError(
+                    "Chain steps {}-{} timed out: {}".format(
+                        i, i + len(group) - 1, e.msg))
+            if 'error' in outcome:
+                i = len(results) + outcome['step']
+                raise ScriptError("Chain step {} {!r} failed: {}".format(
+                    i, steps[i][0], outcome['error']))
+            results.extend(outcome['results'])
+        return results
 
     def find(self, selector, only_displayed=True, wait=False, ttl=None):
         """Find the elements that match the given selector
@@ -338,25 +1300,7 @@ class SeElements(Elements, Browser):
         :returns: An :class:`Elements` object containing the web elements that
                   match the :attr:`selector`
         """
-        ttl = ttl if ttl is not None else self.ttl
-        def callback(elements):
-            def inner(e):
-                matches = e.item.find_elements_by_css_selector(selector)
-                if only_displayed:
-                    matches = [obj for obj in matches if obj.is_displayed()]
-                return matches
-            results = elements.foreach(
-                inner,
-                return_results=True,
-                ttl=ttl)
-            return [item for sublist in results for item in sublist]
-
-        elements = SeElements(
-            self.browser, context=self, fn=callback, config=self.config)
-        if wait:
-            return elements.until(lambda e: len(e) > 0, ttl=ttl)
-        else:
-            return elements
+        return self._query(_FIND_SCRIPT, selector, only_displayed, wait, ttl)
 
     def find_with_wait(self, selector, only_displayed=True, ttl=None):
         """Find the elements that match the given selector with waiting
@@ -398,25 +1342,7 @@ class SeElements(Elements, Browser):
         :returns: An :class:`Elements` object containing the web elements that
                   match the :attr:`selector`
         """
-        ttl = ttl if ttl is not None else self.ttl
-        def callback(elements):
-            def inner(e):
-                matches = e.item.find_elements_by_xpath(selector)
-                if only_displayed:
-                    matches = [obj for obj in matches if obj.is_displayed()]
-                return matches
-            results = elements.foreach(
-                inner,
-                return_results=True,
-                ttl=ttl)
-            return [item for sublist in results for item in sublist]
-
-        elements = SeElements(
-            self.browser, context=self, fn=callback, config=self.config)
-        if wait:
-            return elements.until(lambda e: len(e) > 0, ttl=ttl)
-        else:
-            return elements
+        return self._query(_XPATH_SCRIPT, selector, only_displayed, wait, ttl)
 
     def find_link(
             self, selector, exact=True, only_displayed=True, wait=False,
@@ -443,41 +1369,36 @@ class SeElements(Elements, Browser):
         :returns: An :class:`Elements` object containing the web elements that
                   match the :attr:`selector`
         """
-        ttl = ttl if ttl is not None else self.ttl
-        if exact:
-            def callback(elements):
-                def inner(e):
-                    matches = e.item.find_elements_by_link_text(selector)
-                    if only_displayed:
-                        matches =\
-                            [obj for obj in matches if obj.is_displayed()]
-                    return matches
-                results = elements.foreach(
-                    inner,
-                    return_results=True,
-                    ttl=ttl)
-                return [item for sublist in results for item in sublist]
-        else:
-            def callback(elements):
-                def inner(e):
-                    matches =\
-                        e.item.find_elements_by_partial_link_text(selector)
-                    if only_displayed:
-                        matches =\
-                            [obj for obj in matches if obj.is_displayed()]
-                    return matches
-                results = elements.foreach(
-                    inner,
-                    return_results=True,
-                    ttl=ttl)
-                return [item for sublist in results for item in sublist]
-
-        elements = SeElements(
-            self.browser, context=self, fn=callback, config=self.config)
-        if wait:
-            return elements.until(lambda e: len(e) > 0, ttl=ttl)
-        else:
-            return elements
+        return self._query(
+            _FIND_LINK_SCRIPT, selector, only_displayed, wait, ttl, exact)
+
+    def scroll_and_find(
+            self, selector, x=0, y=None, only_displayed=True, wait=False,
+            ttl=None):
+        """Scroll the page and find the elements that match the selector
+
+        This scrolls and finds the elements in a single call to the browser,
+        e.g. to get the items an infinitely scrolling page loaded::
+
+            items = elements.scroll_and_find('.item', wait=True)
+
+        :param selector: The selector to use
+        :param x: The x position on the page. This can either be a number
+                  (pixels from the left) or a javascript string that evaluates
+                  to a position
+        :param y: The y position on the page. This can either be a number
+                  (pixels from the top) or a javascript string that evaluates
+                  to a position. By default this is the bottom of the page.
+        :param only_displayed: Whether or not to only return elements that
+                               are displayed
+        :param wait: Wait until the selector finds at least 1 element, like
+                     :meth:`find` does
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: An :class:`Elements` object containing the web elements that
+                  match the :attr:`selector`
+        """
+        return self._query(
+            _SCROLL_AND_FIND_SCRIPT, selector, only_displayed, wait, ttl, x, y)
 
     def filter(self, fn):
         """Filter the elements and return only the ones that match the filter
@@ -486,8 +1407,35 @@ class SeElements(Elements, Browser):
         :returns: A new SeElements object with the filter applied
         """
         def callback(elements):
-            return [e.item for e in list(filter(fn, elements))]
-        return SeElements(
+            return [e.item for e in elements if fn(e)]
+        return type(self)(
+            self.browser, context=self, fn=callback, config=self.config)
+
+    def filter_by_js(self, expression, ttl=None):
+        """Filter the elements in the browser with a JavaScript expression
+
+        Unlike :meth:`filter`, this is done in a single call to the browser
+        no matter how many elements there are::
+
+            buttons = elements.find('input').filter_by_js(
+                "el.type === 'submit' && !el.disabled")
+
+        :param expression: The JavaScript expression an element has to match.
+                           The element being tested is available as ``el``.
+        :param ttl: The minimum number of seconds to keep retrying
+        :returns: A new SeElements object with the filter applied
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        script = _FILTER_SCRIPT_TEMPLATE % expression
+        def inner(elements):
+            items = _script_parents(elements)
+            if not any(items):
+                return []
+            return elements.browser.execute_script(script, items)
+
+        def callback(elements):
+            return elements.retried(inner, update=True, ttl=ttl)
+        return type(self)(
             self.browser, context=self, fn=callback, config=self.config)
 
     def title(self, ttl=None):
@@ -496,36 +1444,113 @@ class SeElements(Elements, Browser):
         :param ttl: The minimum number of seconds to keep retrying
         :returns: The title of the page
         """
-        def callback(elements):
-            return elements.browser.title
-        return self.retried(callback, update=True, ttl=ttl)
+        return self.retried(_title, update=True, ttl=ttl, update_on=())
 
     def source(self, ttl=None):
         """Get the source of the page
 
+        The source is only transferred from the browser if the page changed
+        since the last call.
+
         :param ttl: The minimum number of seconds to keep retrying
         :returns: The source of the page
         """
         def callback(elements):
-            return elements.browser.page_source
-        return self.retried(callback, update=True, ttl=ttl)
+            signature = elements.browser.execute_script(
+                _SOURCE_SIGNATURE_SCRIPT)
+            if signature is None or signature != self._source_signature:
+                self._source = elements.browser.page_source
+                self._source_signature = signature
+            return self._source
+
+        return self.retried(callback, update=True, ttl=ttl, update_on=())
 
-    def navigate(self, url, ttl=None):
+    def navigate(self, url, ttl=None, force=False):
         """Navigate the browser to the given URL
 
+        If the browser is already displaying the URL, the page is not loaded
+        again unless :attr:`force` is set.
+
         :param url: The URL to navigate the browser to
-        :param ttl: The minimum number of seconds to keep retrying
+        :param ttl: The number of seconds the page may take to load. If this
+                    is set, the browser's page load timeout is set to it
+                    while loading the page, as long as the timeout to
+                    restore afterwards is known (see
+                    :meth:`set_page_load_timeout`). Loading the page is
+                    retried for that long (or :attr:`ttl` of ``self`` by
+                    default) if the driver can't be reached.
+        :param force: Whether or not to load the page even if the browser is
+                      already displaying the URL
         :returns: ``self``
         """
-        self.retried(lambda: self.browser.get(url), update=False)
+        if not force:
+            with ignored(WebDriverException):
+                if self.browser.current_url == url:
+                    return self
+
+        retry_ttl = ttl if ttl is not None else self.ttl
+        def load():
+            if retry_ttl:
+                ExceptionRetryWaiter(_CONNECTION_ERRORS, ttl=retry_ttl).\
+                    wait(lambda: self.browser.get(url))
+            else:
+                self.browser.get(url)
+
+        previous = self._page_load_timeout() if ttl else None
+        if previous is not None:
+            self.browser.set_page_load_timeout(ttl)
+            try:
+                load()
+            finally:
+                with ignored(WebDriverException):
+                    self.browser.set_page_load_timeout(previous)
+        else:
+            load()
+        self._source_signature = None
+        self._queries.clear()
         return self
 
+    def set_page_load_timeout(self, seconds):
+        """Set the browser's page load timeout
+
+        Use this instead of setting it on the driver directly, so that
+        :meth:`navigate` can restore it after loading a page with a
+        :attr:`ttl`.
+
+        :param seconds: The number of seconds a page may take to load
+        :returns: ``self``
+        """
+        self.browser.set_page_load_timeout(seconds)
+        self.config['page_load_timeout'] = seconds
+        return self
+
+    def _page_load_timeout(self):
+        """Get the browser's current page load timeout
+
+        This is the timeout last set with :meth:`set_page_load_timeout`, or
+        else the one the session was created with, as reported in its
+        capabilities by W3C drivers. Selenium has no way of reading the
+        timeout back from the driver.
+
+        :returns: The timeout in seconds, or ``None`` if it isn't known
+        """
+        timeout = self.config.get('page_load_timeout')
+        if timeout is not None:
+            return timeout
+        with ignored(AttributeError, KeyError, TypeError, WebDriverException):
+            timeout = self.browser.capabilities['timeouts']['pageLoad']
+            if isinstance(timeout, six.integer_types + (float,)):
+                return timeout / 1000.0
+        return None
+
     def refresh(self):
         """Refresh the current page
 
         :returns: ``self``
         """
         self.browser.refresh()
+        self._source_signature = None
+        self._queries.clear()
         return self
 
     def current_url(self):
@@ -536,52 +1561,92 @@ class SeElements(Elements, Browser):
         return self.browser.current_url
 
     def execute_script(
-            self, script, callback=None, asynchronous=False, ttl=None):
+            self, script, callback=None, asynchronous=False, ttl=None,
+            **kwargs):
         """Execute arbitrary JavaScript
 
         :param script: The JavaScript to execute
         :param callback: A function to execute with the results of the script.
                          This function should take a single parameter, the
                          results from the script.
-        :param asynchronous: Whether or not to do it asynchronously
+        :param asynchronous: Whether or not to do it asynchronously. If so, the
+                             script is passed a callback as its last argument
+                             that it must call with its results.
         :param ttl: The minimum number of seconds to keep retrying
         :returns: If :attr:`callback` is provided, then this will return the
                   results form the callback. If not, this will return the
                   results from the script that was executed
         """
+        if 'async' in kwargs:
+            warnings.warn(
+                "The async parameter is deprecated, use asynchronous instead",
+                DeprecationWarning, stacklevel=2)
+            asynchronous = kwargs.pop('async')
+        if kwargs:
+            raise TypeError("Unexpected keyword arguments: {}".format(
+                ', '.join(sorted(kwargs))))
         if asynchronous:
-            raise NotImplementedError(
-                "Can't perform asynchronous scripts yet. Sorry.")
-        results = self.retried(
-            lambda: self.browser.execute_script(script), update=False)
+            execute = self.browser.execute_async_script
+        else:
+            execute = self.browser.execute_script
+        results = self.retried(lambda: execute(script), update=False, ttl=ttl)
         if not callback:
             return results
         else:
             return callback(results)
 
-    def get_window_size(self):
-        """Get the size of the browser window
+    def execute_script_batch(self, script, items):
+        """Run a script for each of the given items in a single call
 
-        :returns: A tuple of the form ``(width, height)`` where the units are
-                  pixels
+        :param script: The body of a JavaScript function that takes the item
+                       as ``el``. The browser itself is passed as ``null``.
+        :param items: The items to run the script for
+        :returns: A list with the result of the script for each of the items
         """
-        with ignored(Exception):
-            dim = self.browser.get_window_size()
-            return (dim['width'], dim['height'])
+        browser = self.browser
+        return browser.execute_script(
+            _BATCH_SCRIPT_TEMPLATE % script,
+            [None if item is browser else item for item in items])
 
-    def set_window_size(self, width, height, sleep=DEFAULT_SLEEP_TIME):
+    def get_window_size(self, ttl=0):
+        """Get the size of the browser window
+
+        :param ttl: The minimum number of seconds to keep retrying. By default
+                    this doesn't retry, since drivers that don't support
+                    getting the size fail every time.
+        :returns: A :class:`WindowSize` tuple of the form ``(width, height)``
+                  where the units are pixels, or ``None`` if the size could
+                  not be determined
+        """
+        try:
+            dim = self.retried(
+                lambda: self.browser.get_window_size(), update=False, ttl=ttl)
+        except WebDriverException:
+            return None
+        return WindowSize(dim['width'], dim['height'])
+
+    def set_window_size(
+            self, width, height, sleep=DEFAULT_SLEEP_TIME, ttl=0):
         """Set the size of the browser window
 
         :param width: Browser width in pixels
         :param height: Browser height in pixels
-        :param sleep: The number of seconds to sleep after the command to make
-                      sure the command has been run
+        :param sleep: The maximum number of seconds to wait for the page to be
+                      rendered at the new size. If this is ``0``, this won't
+                      wait at all.
+        :param ttl: The minimum number of seconds to keep retrying. As with
+                    :meth:`get_window_size`, this doesn't retry by default.
         :returns: ``self``
         """
-        with ignored(Exception):
-            self.browser.set_window_size(width, height)
+        with ignored(WebDriverException):
+            self.retried(
+                lambda: self.browser.set_window_size(width, height),
+                update=False, ttl=ttl)
             if sleep:
-                time.sleep(sleep)
+                self.browser.execute_async_script(
+                    _SETTLE_SCRIPT +
+                    "settle(arguments[0], arguments[arguments.length - 1]);",
+                    int(sleep * 1000))
         return self
 
     def scroll(self, x=0, y=0, sleep=DEFAULT_SLEEP_TIME):
@@ -593,13 +1658,31 @@ class SeElements(Elements, Browser):
         :param y: The y position on the page. This can either be a number
                   (pixels from the top) or a javascript string that evaluates
                   to a position (e.g. ``document.body.scrollHeight``)
-        :param sleep: The number of seconds to sleep after the command to make
-                      sure the command has been run
+        :param sleep: The maximum number of seconds to wait for the page to be
+                      rendered at the new position. If this is ``0``, this
+                      won't wait at all.
         :returns: ``self``
         """
-        self.browser.execute_script("window.scrollTo({}, {});".format(x, y))
+        return self._scroll(_SCROLL_SCRIPT, x, y, sleep)
+
+    def _scroll(self, script, x, y, sleep):
+        """Run one of the scroll scripts
+
+        :param script: The scroll script to run
+        :param x: The x position on the page
+        :param y: The y position on the page
+        :param sleep: The maximum number of seconds to wait for the page to be
+                      rendered at the new position
+        :returns: ``self``
+        """
+        timeout = int(sleep * 1000) if sleep else 0
         if sleep:
-            time.sleep(sleep)
+            # The page is scrolled before the wait starts, so a driver script
+            # timeout lower than sleep only cuts the wait short
+            with ignored(TimeoutException):
+                self.browser.execute_async_script(script, x, y, timeout)
+        else:
+            self.browser.execute_script(script, x, y, timeout)
         return self
 
     def scroll_top(self, x=0, sleep=DEFAULT_SLEEP_TIME):
@@ -608,8 +1691,8 @@ class SeElements(Elements, Browser):
         :param x: The x position on the page. This can either be a number
                   (pixels from the left) or a javascript string that evaluates
                   to a position (e.g. ``document.body.scrollHeight``)
-        :param sleep: The number of seconds to sleep after the command to make
-                      sure the command has been run
+        :param sleep: The maximum number of seconds to wait for the page to be
+                      rendered at the new position
         :returns: ``self``
         """
         return self.scroll(x=x, y=0, sleep=sleep)
@@ -620,19 +1703,20 @@ class SeElements(Elements, Browser):
         :param x: The x position on the page. This can either be a number
                   (pixels from the left) or a javascript string that evaluates
                   to a position (e.g. ``document.body.scrollHeight``)
-        :param sleep: The number of seconds to sleep after the command to make
-                      sure the command has been run
+        :param sleep: The maximum number of seconds to wait for the page to be
+                      rendered at the new position
         :returns: ``self``
         """
-        return self.scroll(x=x, y="document.body.scrollHeight", sleep=sleep)
+        return self._scroll(_SCROLL_BOTTOM_SCRIPT, x, None, sleep)
 
     def run(self, fn, ttl=None):
         """Run the given function
 
-        :param fn: The function to run
+        :param fn: The function to run. It is called without any arguments.
         :param ttl: The minimum number of seconds to keep retrying
+        :returns: The result of calling :attr:`fn`
         """
-        return self.retried(lambda e: fn, update=False, ttl=ttl)
+        return self.retried(fn, update=False, ttl=ttl)
 
     def switch_to_active_element(self):
         """Get the active element
@@ -642,5 +1726,5 @@ class SeElements(Elements, Browser):
         def callback(elements):
             return [elements.item.switch_to_active_element()]\
                     if elements.items else None
-        return SeElements(
+        return type(self)(
             self.browser, context=self, fn=callback, config=self.config)
@@ -2,14 +2,17 @@
 from __future__ import absolute_import
 
 import abc
-import collections
+import functools
 import six
 import time
 
+from six.moves import collections_abc
+
 from elementium.exc import TimeOutError
 from elementium.util import (
     DEFAULT_TTL,
-    ignored
+    ignored,
+    monotonic
 )
 from elementium.waiters import ConditionElementsWaiter
 
@@ -18,10 +21,36 @@ __author__ = "Patrick R. Schmid"
 __email__ = "prschmid@act.md"
 
 
+def batchable(script):
+    """Give a function for :meth:`Elements.foreach` a JavaScript equivalent
+
+    If the browser supports it, :meth:`Elements.foreach` then runs the script
+    for all of the items in a single call instead of calling the function on
+    each item::
+
+        @batchable("return el.getAttribute('href');")
+        def href(elements):
+            return elements.attribute('href')
+
+        hrefs = elements.find('a').foreach(href, return_results=True)
+
+    :param script: The body of a JavaScript function that takes the web
+                   element as ``el`` and returns the same result as the
+                   decorated function
+    :returns: The decorator
+    """
+    def decorator(fn):
+        fn.batch_script = script
+        return fn
+    return decorator
+
+
 @six.add_metaclass(abc.ABCMeta)
 class Browser(object):
     """A base interface for a browser."""
 
+    __slots__ = ()
+
     @abc.abstractmethod
     def title(self):
         """Get the title of the page"""
@@ -72,6 +101,18 @@ class Browser(object):
         """
         return
 
+    def execute_script_batch(self, script, items):
+        """Run a script for each of the given items in a single call
+
+        :param script: The body of a JavaScript function that takes the item
+                       as ``el``
+        :param items: The items to run the script for
+        :returns: A list with the result of the script for each of the items
+        :raise:
+            :NotImplementedError: If the browser does not support this
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_window_size(self):
         """Get the size of the browser window
@@ -92,31 +133,14 @@ class Browser(object):
         return
 
 
-class ElementsIterator(object):
-    """Iterator for Elements"""
-
-    def __init__(self, elements):
-        self.elements = elements
-        self.idx = -1
-
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        return self.next()
-
-    def next(self):
-        self.idx += 1
-        if self.idx < len(self.elements.items):
-            return self.elements[self.idx]
-        else:
-            raise StopIteration
-
-
 @six.add_metaclass(abc.ABCMeta)
-class Elements(collections.MutableSequence):
+class Elements(object):
     """The abstract base class for a list of web elements"""
 
+    __slots__ = (
+        'browser', 'context', 'fn', 'config', '_items', '_wrappers',
+        '_queries', '_cached')
+
     def __init__(self, browser, context=None, fn=None, config=None, lazy=None):
         """Create a list of elements
 
@@ -125,11 +149,18 @@ class Elements(collections.MutableSequence):
                         "parent" set of :class:`Elements` that is giving
                         rise to this set of :class:`Elements`.
         :param fn: The function to call to populate the list of browser
-                   elements this list of :class:`Elements` refers to.
+                   elements this list of :class:`Elements` refers to. If this
+                   is not set, the only item is the :attr:`browser` itself.
         :param config: Optional other configuration details in a dictionary.
                        Valid options are:
 
                             `lazy`: Whether or not to lazy load the items.
+                            `cache_queries`: Whether or not queries with the
+                                             same arguments (e.g. finding the
+                                             same selector twice) return the
+                                             same :class:`Elements` until
+                                             update() is called. The default
+                                             is ``False``.
 
         :param lazy: Whether or not to lazy load the items. If this is ``True``
                      then the :attr:`fn` is evaluated on first access.
@@ -142,31 +173,89 @@ class Elements(collections.MutableSequence):
         super(Elements, self).__init__()
         self.browser = browser
         self.context = context
-        if not fn:
-            fn = lambda context: [browser]
-        self.fn = fn
+        self.fn = fn if fn else None
         self.config = config if config else {}
         if not self.config.get('ttl'):
             self.config['ttl'] = DEFAULT_TTL
         self.config['lazy'] = lazy if lazy is not None else False
         self._items = None
+        self._wrappers = {}
+        self._queries = {}
+        self._cached = False
         if not self.lazy:
             self.items
 
     def __repr__(self):
         return '{}({!r})'.format(self.__class__.__name__, self.items)
-    def __setitem__(self, i, value): self.items[i] = value
-    def __delitem__(self, i): del self.items[i]
-    def __getitem__(self, i): return self.get(i)
-    def __len__(self): return len(self.items)
-    def __iter__(self): return ElementsIterator(self)
-    def __contains__(self, item): return item in self.items
-    def insert(self, index, value): self.items.insert(index, value)
+    def __iter__(self): return (self[i] for i in range(len(self)))
+
+    # len() and ``in`` are used a lot in conditions, so skip the items
+    # property once the items have been fetched
+    def __len__(self):
+        items = self._items
+        return len(items if items is not None else self.items)
+
+    def __contains__(self, item):
+        items = self._items
+        return item in (items if items is not None else self.items)
+
+    def __getitem__(self, i):
+        if not isinstance(i, six.integer_types):
+            return self.get(i)
+        wrapper = self._wrappers.get(i)
+        if wrapper is None:
+            wrapper = self._wrappers[i] = self.get(i)
+        return wrapper
+
+    def __setitem__(self, i, value):
+        self._wrappers.clear()
+        self.items[i] = value
+
+    def __delitem__(self, i):
+        self._wrappers.clear()
+        del self.items[i]
+
+    def __reversed__(self):
+        return (self[i] for i in reversed(range(len(self.items))))
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def insert(self, index, value):
+        self._wrappers.clear()
+        self.items.insert(index, value)
+
+    def append(self, value):
+        self._wrappers.clear()
+        self.items.append(value)
+
+    def extend(self, values):
+        self._wrappers.clear()
+        self.items.extend(values)
+
+    def pop(self, index=-1):
+        value = self[index]
+        del self[index]
+        return value
+
+    def remove(self, value):
+        self._wrappers.clear()
+        self.items.remove(value)
+
+    def reverse(self):
+        self._wrappers.clear()
+        self.items.reverse()
+
+    # Like ``in`` and remove(), these compare the raw items rather than the
+    # wrapping Elements, so they don't have to build a wrapper per item
+    def index(self, value): return self.items.index(value)
+    def count(self, value): return self.items.count(value)
 
     @property
     def items(self):
         """The items that this elements object refers to"""
-        if not self._items:
+        if self._items is None:
             self.update(propagate=False)
         return self._items
 
@@ -385,11 +474,14 @@ class Elements(collections.MutableSequence):
         """
         return
 
-    def foreach(self, fn, return_results=False, pause=0, ttl=None):
+    def foreach(
+            self, fn, return_results=False, pause=0, ttl=None, refetch=True):
         """Apply the given function to each item.
 
         This will make sure that each item is actually an Element object and
-        not the underlying type.
+        not the underlying type. If :attr:`fn` is :func:`batchable` and there
+        is no :attr:`pause`, it is run for all of the items in a single call
+        to the browser instead, where the browser supports it.
 
         :param fn: The function to apply. This function should be of the form:
 
@@ -405,6 +497,10 @@ class Elements(collections.MutableSequence):
                       to run the :attr:`fn` for each item. This is included
                       in the :attr:`ttl` calculation.
         :param ttl: The minimum number of seconds to keep retrying
+        :param refetch: Whether or not to update the elements (and their
+                        contexts) before retrying :attr:`fn` on an item. This
+                        can be turned off if :attr:`fn` only reads from the
+                        item and fails for reasons other than it going stale.
         :returns: If :attr:`return_results` is ``True``, then this will return
                   a list of length equal to ``len(self)`` where the i-th entry
                   in the list is the result of calling :attr:`fn` on the i-th
@@ -412,12 +508,26 @@ class Elements(collections.MutableSequence):
                   then ``self`` is returned.
         """
         ttl = ttl if ttl is not None else self.ttl
-        retvals = []
-        start_time = time.time()
-        for element in self:
-            if ttl:
-                ttl = ttl - (time.time() - start_time)
-            retvals.append(element.retried(fn, update=True, ttl=ttl))
+        script = getattr(fn, 'batch_script', None)
+        if script is not None and not pause and isinstance(self, Browser):
+            def batch(elements):
+                return elements.execute_script_batch(script, elements.items)
+            with ignored(NotImplementedError):
+                retvals = self.retried(batch, update=True, ttl=ttl)
+                return retvals if return_results else self
+
+        retvals = [None] * len(self.items) if return_results else None
+        etime = monotonic() + ttl if ttl else None
+        for i, element in enumerate(self):
+            if etime is not None:
+                ttl = max(0, etime - monotonic())
+            if refetch:
+                retval = element.retried(fn, update=True, ttl=ttl)
+            else:
+                retval = element.retried(
+                    functools.partial(fn, element), update=False, ttl=ttl)
+            if return_results:
+                retvals[i] = retval
             if pause:
                 time.sleep(pause)
         if return_results:
@@ -474,19 +584,92 @@ class Elements(collections.MutableSequence):
         :returns: ``self``
         """
         ttl = ttl if ttl is not None else self.ttl
-        with ignored(TimeOutError):
+        try:
             ConditionElementsWaiter(self).wait(fn, ttl=ttl)
-        assert fn(self)
+        except TimeOutError:
+            # Only check the condition again if it was never met
+            assert fn(self)
+        return self
+
+    def _cached_query(self, key, build):
+        """Get the result of a query, reusing it if ``cache_queries`` is set
+
+        :param key: The hashable arguments that identify the query
+        :param build: The function that runs the query and returns its
+                      :class:`Elements`
+        :returns: The :class:`Elements` for the query
+        """
+        if not self.config.get('cache_queries'):
+            return build()
+        elements = self._queries.get(key)
+        if elements is None:
+            elements = self._queries[key] = build()
+        return elements
+
+    def cache(self):
+        """Stop refreshing the list of web elements until :meth:`invalidate`
+
+        Once cached, :meth:`update` (including the implicit updates when
+        retrying or waiting) leaves the current items alone, so repeatedly
+        going over the same elements doesn't query the browser again. Only
+        use this if the elements won't be replaced in the DOM in the meantime.
+
+        :returns: ``self``
+        """
+        self.items
+        self._cached = True
+        return self
+
+    def invalidate(self):
+        """Undo :meth:`cache` and refresh the items on the next access
+
+        :returns: ``self``
+        """
+        self._cached = False
+        self._items = None
+        self._wrappers.clear()
+        self._queries.clear()
+        return self
+
+    def _set_items(self, items):
+        """Replace the items with ones that were fetched some other way
+
+        Like :meth:`update`, this drops everything derived from the old
+        items.
+
+        :param items: The new list of items
+        :returns: ``self``
+        """
+        self._wrappers.clear()
+        self._queries.clear()
+        self._items = items
         return self
 
     def update(self, propagate=True):
         """Refresh the list of web elements
 
         :param propagate: Whether or not to update the context's elements as
-                          well
+                          well (and their context's elements, and so on)
+                          Cached elements (see :meth:`cache`) are left as is.
         :returns: ``self``
         """
-        if propagate and self.context:
-            self.context.update(propagate=True)
-        self._items = self.fn(self.context)
+        chain = [self]
+        if propagate:
+            context = self.context
+            while context is not None:
+                chain.append(context)
+                context = context.context
+        for elements in reversed(chain):
+            if elements._cached:
+                continue
+            elements._wrappers.clear()
+            elements._queries.clear()
+            if elements.fn is None:
+                elements._items = [elements.browser]
+            else:
+                elements._items = elements.fn(elements.context) or []
         return self
+
+
+# Elements still behaves like a list, so keep isinstance() checks working
+collections_abc.MutableSequence.register(Elements)
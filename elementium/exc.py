@@ -12,3 +12,8 @@ class ElementiumError(Exception):
 class TimeOutError(ElementiumError):
     """A timeout error"""
     pass
+
+
+class ScriptError(ElementiumError):
+    """An error raised by a script that was run in the browser"""
+    pass
@@ -2,7 +2,10 @@
 
 from __future__ import absolute_import
 
-from contextlib import contextmanager
+try:
+    from time import monotonic
+except ImportError:  # Python 2
+    from time import time as monotonic
 
 __author__ = "Patrick R. Schmid"
 __email__ = "prschmid@act.md"
@@ -11,10 +14,44 @@ __email__ = "prschmid@act.md"
 DEFAULT_SLEEP_TIME = 0.25
 DEFAULT_TTL = 20
 
+# Backoff used by all waiters and retries: start with a short pause,
+# double it after each failure (up to the max), and vary each pause by a bit
+# so that retries don't all line up.
+DEFAULT_RETRY_PAUSE = 0.05
+DEFAULT_MAX_PAUSE = 0.5
+DEFAULT_JITTER = 0.1
 
-@contextmanager
-def ignored(*exceptions):
-    try:
-        yield
-    except exceptions:
-        pass
+
+class ignored(object):
+    """Ignore the given exceptions for the duration of a ``with`` block
+
+    This is a plain class rather than a :func:`contextlib.contextmanager`, so
+    entering and leaving it doesn't have to drive a generator.
+    """
+
+    __slots__ = ('exceptions',)
+
+    def __init__(self, *exceptions):
+        self.exceptions = exceptions
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return exc_type is not None and issubclass(exc_type, self.exceptions)
+
+
+def as_exception_tuple(exceptions):
+    """Turn an exception or an iterable of exceptions into a tuple
+
+    The result can be used directly in an ``except`` clause.
+
+    :param exceptions: The exception class, or the iterable of exception
+                       classes
+    :returns: A tuple of the exception classes
+    """
+    if isinstance(exceptions, tuple):
+        return exceptions
+    if not hasattr(exceptions, '__iter__'):
+        return (exceptions,)
+    return tuple(exceptions)
@@ -4,14 +4,20 @@ from __future__ import absolute_import
 
 import abc
 import inspect
+import random
 import six
 import time
+import weakref
 
 from elementium.exc import TimeOutError
 from elementium.util import (
-    DEFAULT_SLEEP_TIME,
+    DEFAULT_JITTER,
+    DEFAULT_MAX_PAUSE,
+    DEFAULT_RETRY_PAUSE,
     DEFAULT_TTL,
-    ignored
+    as_exception_tuple,
+    ignored,
+    monotonic
 )
 
 
@@ -19,16 +25,48 @@ __author__ = "Patrick R. Schmid"
 __email__ = "prschmid@act.md"
 
 
+# The source of the conditions that timed out, so that a condition that keeps
+# timing out doesn't have to be read from its file every time
+_SOURCES = weakref.WeakKeyDictionary()
+
+
+def _source(fn):
+    """Get the source of a function to use as the reason for a timeout
+
+    :param fn: The function
+    :returns: The stripped source of :attr:`fn`, or ``"Unknown"`` if it can't
+              be found
+    """
+    with ignored(TypeError):
+        reason = _SOURCES.get(fn)
+        if reason is not None:
+            return reason
+    reason = "Unknown"
+    with ignored(Exception):
+        reason = inspect.getsource(fn).strip()
+    with ignored(TypeError):
+        _SOURCES[fn] = reason
+    return reason
+
+
 @six.add_metaclass(abc.ABCMeta)
 class Waiter(object):
     """Wait for something to happen"""
 
-    def __init__(self, n=0, ttl=None, pause=1):
+    def __init__(
+            self, n=0, ttl=None, pause=DEFAULT_RETRY_PAUSE,
+            max_pause=DEFAULT_MAX_PAUSE, jitter=DEFAULT_JITTER):
         """Create a new Waiter
 
         :param n: The number of times to retry.
         :param ttl: The number of seconds to wait.
-        :param pause: The number of seconds to pause between retries
+        :param pause: The number of seconds to pause between retries. This
+                      doubles after every retry.
+        :param max_pause: The maximum number of seconds to pause between
+                          retries. If set to ``None``, the pause keeps on
+                          doubling.
+        :param jitter: The fraction by which each pause is randomly made
+                       longer or shorter (e.g. ``0.1`` for +/- 10%)
         """
         if n and ttl:
             raise ValueError("Cannot set both n and ttl")
@@ -38,9 +76,15 @@ class Waiter(object):
             raise ValueError("ttl cannot be negative")
         if pause and pause < 0:
             raise ValueError("pause cannot be negative")
+        if max_pause and max_pause < 0:
+            raise ValueError("max_pause cannot be negative")
+        if jitter and not 0 <= jitter < 1:
+            raise ValueError("jitter must be in the range [0, 1)")
         self.n = n
         self.ttl = ttl if ttl else 0
         self.pause = pause
+        self.max_pause = max_pause
+        self.jitter = jitter
 
     @abc.abstractmethod
     def wait(self, n=0, ttl=None, **kwargs):
@@ -59,6 +103,27 @@ class Waiter(object):
         """
         return
 
+    def _backoff(self, pause, etime=None):
+        """Sleep between two retries
+
+        :param pause: The number of seconds to sleep for (before jitter is
+                      applied)
+        :param etime: The :func:`monotonic` time by which the waiting has to
+                      be done. The sleep is cut short so as to not go past it.
+        :returns: The number of seconds to sleep for before the next retry
+        """
+        if self.jitter:
+            duration = pause * random.uniform(1 - self.jitter, 1 + self.jitter)
+        else:
+            duration = pause
+        if etime is not None:
+            duration = max(0, min(duration, etime - monotonic()))
+        time.sleep(duration)
+        pause = pause * 2
+        if self.max_pause:
+            pause = min(pause, self.max_pause)
+        return pause
+
     def _check_args(self, n, ttl):
         """Helper function to check the n and ttl arguments
 
@@ -95,22 +160,23 @@ class Waiter(object):
 class ExceptionRetryWaiter(Waiter):
 
     def __init__(
-            self, exceptions, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_SLEEP_TIME):
+            self, exceptions, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_RETRY_PAUSE,
+            max_pause=DEFAULT_MAX_PAUSE, jitter=DEFAULT_JITTER):
         """Create a new Waiter
 
         :param exceptions: The exception or iterable of exceptions to retry on
         :param n: The number of times to retry.
         :param ttl: The number of seconds to wait.
         :param pause: The number of seconds to pause between retries
+        :param max_pause: The maximum number of seconds to pause between
+                          retries
+        :param jitter: The fraction by which each pause is randomly varied
         """
-        super(ExceptionRetryWaiter, self).__init__(n=n, ttl=ttl, pause=pause)
+        super(ExceptionRetryWaiter, self).__init__(
+            n=n, ttl=ttl, pause=pause, max_pause=max_pause, jitter=jitter)
         if not exceptions:
             raise ValueError("Must provide exceptions to retry on")
-        if not hasattr(exceptions, '__iter__'):
-            exceptions = [exceptions]
-        if not isinstance(exceptions, tuple):
-            exceptions = tuple(exceptions)
-        self.exceptions = exceptions
+        self.exceptions = as_exception_tuple(exceptions)
 
     def wait(self, fn, n=0, ttl=None):
         """Retry a function for :attr:`ttl` seconds
@@ -123,16 +189,17 @@ class ExceptionRetryWaiter(Waiter):
         :returns: The result of running :attr:`fn`
         """
         n, ttl = self._check_args(n, ttl)
-        etime = time.time() + ttl
+        etime = monotonic() + ttl
+        deadline = etime if ttl else None
         pause = self.pause
+        exceptions = self.exceptions
         while True:
             n -= 1
             try:
                 return fn()
-            except self.exceptions as exc:
-                if time.time() < etime or n > 0:
-                    time.sleep(pause)
-                    pause = min(pause + pause, pause * 4)
+            except exceptions as exc:
+                if monotonic() < etime or n > 0:
+                    pause = self._backoff(pause, deadline)
                 else:
                     raise exc
 
@@ -141,15 +208,20 @@ class ElementsWaiter(Waiter):
     """Wait for something to happen"""
 
     def __init__(
-            self, elements, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_SLEEP_TIME):
+            self, elements, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_RETRY_PAUSE,
+            max_pause=DEFAULT_MAX_PAUSE, jitter=DEFAULT_JITTER):
         """Create a new Waiter
 
         :param elements: The :class:`Elements` we want to wait on.
         :param n: The number of times to retry.
         :param ttl: The number of seconds to wait.
         :param pause: The number of seconds to pause between retries
+        :param max_pause: The maximum number of seconds to pause between
+                          retries
+        :param jitter: The fraction by which each pause is randomly varied
         """
-        super(ElementsWaiter, self).__init__(n=n, ttl=ttl, pause=pause)
+        super(ElementsWaiter, self).__init__(
+            n=n, ttl=ttl, pause=pause, max_pause=max_pause, jitter=jitter)
         self.elements = elements
 
 
@@ -157,7 +229,8 @@ class ExceptionRetryElementsWaiter(ElementsWaiter):
 
     def __init__(
             self, elements, exceptions, n=0, ttl=DEFAULT_TTL,
-            pause=DEFAULT_SLEEP_TIME):
+            pause=DEFAULT_RETRY_PAUSE, max_pause=DEFAULT_MAX_PAUSE,
+            jitter=DEFAULT_JITTER, update_on=None):
         """Create a new Waiter
 
         :param elements: The :class:`Elements` we want to wait on.
@@ -165,16 +238,21 @@ class ExceptionRetryElementsWaiter(ElementsWaiter):
         :param n: The number of times to retry.
         :param ttl: The number of seconds to wait.
         :param pause: The number of seconds to pause between retries
+        :param max_pause: The maximum number of seconds to pause between
+                          retries
+        :param jitter: The fraction by which each pause is randomly varied
+        :param update_on: The exception or iterable of exceptions after which
+                          the elements are updated before retrying. By
+                          default this is all of the :attr:`exceptions`.
         """
         super(ExceptionRetryElementsWaiter, self).__init__(
-            elements=elements, n=n, ttl=ttl, pause=pause)
+            elements=elements, n=n, ttl=ttl, pause=pause, max_pause=max_pause,
+            jitter=jitter)
         if not exceptions:
             raise ValueError("Must provide exceptions to retry on")
-        if not hasattr(exceptions, '__iter__'):
-            exceptions = [exceptions]
-        if not isinstance(exceptions, tuple):
-            exceptions = tuple(exceptions)
-        self.exceptions = exceptions
+        self.exceptions = as_exception_tuple(exceptions)
+        self.update_on = as_exception_tuple(
+            update_on if update_on is not None else self.exceptions)
 
     def wait(self, fn, n=0, ttl=None):
         """Retry a function for :attr:`ttl` seconds
@@ -187,19 +265,22 @@ class ExceptionRetryElementsWaiter(ElementsWaiter):
         :returns: The result of running :attr:`fn`
         """
         n, ttl = self._check_args(n, ttl)
-        etime = time.time() + ttl
+        etime = monotonic() + ttl
+        deadline = etime if ttl else None
         pause = self.pause
         exc_from_run = None
-        while time.time() < etime or n > 0:
+        elements, exceptions, update_on = \
+            self.elements, self.exceptions, self.update_on
+        backoff = self._backoff
+        while monotonic() < etime or n > 0:
             n -= 1
             try:
-                return fn(self.elements)
-            except self.exceptions as exc:
-                time.sleep(pause)
-                pause = min(pause + pause, pause * 4)
+                return fn(elements)
+            except exceptions as exc:
+                pause = backoff(pause, deadline)
                 exc_from_run = exc
-                if self.elements:
-                    self.elements.update()
+                if elements and isinstance(exc, update_on):
+                    elements.update()
         else:
             if exc_from_run:
                 raise exc_from_run
@@ -214,6 +295,31 @@ class ExceptionRetryElementsWaiter(ElementsWaiter):
 class ConditionElementsWaiter(ElementsWaiter):
     """Wait for a condition to be met"""
 
+    def __init__(
+            self, elements, n=0, ttl=DEFAULT_TTL, pause=DEFAULT_RETRY_PAUSE,
+            max_pause=DEFAULT_MAX_PAUSE, jitter=DEFAULT_JITTER,
+            full_update_every=3):
+        """Create a new Waiter
+
+        :param elements: The :class:`Elements` we want to wait on.
+        :param n: The number of times to retry.
+        :param ttl: The number of seconds to wait.
+        :param pause: The number of seconds to pause between retries
+        :param max_pause: The maximum number of seconds to pause between
+                          retries
+        :param jitter: The fraction by which each pause is randomly varied
+        :param full_update_every: How often to update the contexts of the
+                                  elements as well between retries. The other
+                                  times only the elements themselves are
+                                  updated.
+        """
+        super(ConditionElementsWaiter, self).__init__(
+            elements, n=n, ttl=ttl, pause=pause, max_pause=max_pause,
+            jitter=jitter)
+        if full_update_every < 1:
+            raise ValueError("full_update_every must be at least 1")
+        self.full_update_every = full_update_every
+
     def wait(self, fn, n=0, ttl=None):
         """Wait until a particular condition is met
 
@@ -229,20 +335,20 @@ class ConditionElementsWaiter(ElementsWaiter):
                   constructor
         """
         n, ttl = self._check_args(n, ttl)
-        etime = time.time() + ttl
+        etime = monotonic() + ttl
+        deadline = etime if ttl else None
         pause = self.pause
-        while time.time() < etime or n > 0:
+        retries = 0
+        elements, full_update_every = self.elements, self.full_update_every
+        backoff, update = self._backoff, elements.update
+        while monotonic() < etime or n > 0:
             n -= 1
-            if not fn(self.elements):
-                time.sleep(pause)
-                pause = min(pause + pause, pause * 4)
-                self.elements.update()
+            if not fn(elements):
+                pause = backoff(pause, deadline)
+                retries += 1
+                update(propagate=retries % full_update_every == 0)
             else:
                 break
         else:
-            reason = "Unknown"
-            with ignored(Exception):
-                reason = inspect.getsource(fn)
-                reason = reason.strip()
-            raise TimeOutError(reason)
+            raise TimeOutError(_source(fn))
         return self.elements
@@ -2,7 +2,9 @@ from __future__ import (
     absolute_import,
     print_function)
 from setuptools import setup
+import ast
 import codecs
+import io
 import os
 import re
 
@@ -12,17 +14,18 @@ here = os.path.abspath(os.path.dirname(__file__))
 def read(file_paths, default=""):
     # intentionally *not* adding an encoding option to open
     try:
-        return codecs.open(os.path.join(here, *file_paths), 'r').read()
+        with codecs.open(os.path.join(here, *file_paths), 'r') as f:
+            return f.read()
     except:
         return default
 
 
 def find_version(file_paths):
-    version_file = read(file_paths)
-    version_match = re.search(r"^__version__ = ['\"]([^'\"]*)['\"]",
-                              version_file, re.M)
-    if version_match:
-        return version_match.group(1)
+    # Stop at the __version__ line instead of reading the whole file
+    with io.open(os.path.join(here, *file_paths), encoding='utf-8') as f:
+        for line in f:
+            if re.match(r'__version__\s*=', line):
+                return ast.literal_eval(ast.parse(line).body[0].value)
     raise RuntimeError("Unable to find version string.")
 
 
@@ -37,7 +40,8 @@ setup(
     author='Patrick R. Schmid',
     install_requires=[
         'selenium==3.141.0',
-        'six==1.13.0'
+        'six==1.13.0',
+        'urllib3>=1.24'
         ],
     author_email='prschmid@act.md',
     description=description,
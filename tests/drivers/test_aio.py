@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+
+__author__ = "Patrick R. Schmid"
+__email__ = "prschmid@act.md"
+
+
+import six
+import threading
+import unittest
+
+from mock import MagicMock
+
+from elementium.drivers.se import SeElements
+
+if six.PY3:
+    import asyncio
+
+    from elementium.drivers.aio import AsyncSeElements
+
+
+def suite():
+    """Define all the tests of the module."""
+    suite = unittest.TestSuite()
+    load = unittest.defaultTestLoader.loadTestsFromTestCase
+    suite.addTest(load(AsyncSeElementsTestCase))
+    return suite
+
+
+@unittest.skipIf(six.PY2, "asyncio requires Python 3")
+class AsyncSeElementsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_methods_are_run_in_the_executor(self):
+        browser = MagicMock()
+        browser.title = 'Title'
+        elements = AsyncSeElements(SeElements(browser), loop=self.loop)
+
+        self.assertEqual(
+            'Title', self.loop.run_until_complete(elements.title()))
+
+    def test_returned_elements_are_wrapped(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = ['a']
+        elements = AsyncSeElements(SeElements(browser), loop=self.loop)
+
+        found = self.loop.run_until_complete(elements.find('.foo'))
+        self.assertIsInstance(found, AsyncSeElements)
+        self.assertEqual(['a'], found.items)
+
+    def test_items_are_fetched_in_the_executor(self):
+        threads = []
+        def find(*args):
+            threads.append(threading.current_thread())
+            return ['a']
+        browser = MagicMock()
+        browser.execute_script.side_effect = find
+        elements = AsyncSeElements(SeElements(browser), loop=self.loop)
+
+        found = self.loop.run_until_complete(elements.find('.foo'))
+        self.assertEqual(1, len(found))
+        self.assertEqual(['a'], found.items)
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    def test_exceptions_are_raised_when_awaited(self):
+        se = MagicMock(spec=SeElements)
+        se.click.side_effect = ValueError
+        elements = AsyncSeElements(se, loop=self.loop)
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(elements.click())
+
+
+if __name__ == '__main__':
+    unittest.main()
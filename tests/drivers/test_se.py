@@ -4,48 +4,738 @@ __author__ = "Patrick R. Schmid"
 __email__ = "prschmid@act.md"
 
 
+import json
+import socket
+import subprocess
 import unittest
+import warnings
 
-from mock import patch
+from mock import MagicMock, patch
+from selenium.common.exceptions import (
+    TimeoutException,
+    WebDriverException
+)
 
+from elementium.drivers import se as se_module
+from elementium.elements import batchable
+from elementium.exc import ScriptError, TimeOutError
 from elementium.drivers.se import SeElements
 
+try:
+    from shutil import which
+except ImportError:  # Python 2
+    from distutils.spawn import find_executable as which
+
+
+NODE = which('node')
+
+# A minimal DOM for running the driver's scripts with node. el(tag, props,
+# children) creates an element. Its computed style is ``props.style`` and its
+# bounding rect ``props.rect`` (10x10 at the origin by default).
+_DOM = """
+global.window = {getComputedStyle: function(el) { return el.style; }};
+global.Event = function(type) { this.type = type; };
+function el(tag, props, children) {
+    var node = {
+        tagName: tag.toUpperCase(), nodeType: 1, parentNode: null,
+        parentElement: null, children: children || [], value: '',
+        maxLength: -1, disabled: false, readOnly: false,
+        rect: {left: 0, top: 0, right: 10, bottom: 10, width: 10, height: 10},
+        getBoundingClientRect: function() { return this.rect; },
+        focus: function() {}, dispatchEvent: function() {}
+    };
+    props = props || {};
+    node.style = {display: 'block', visibility: 'visible',
+                  overflowX: 'visible', overflowY: 'visible'};
+    for (var key in props.style || {}) {
+        node.style[key] = props.style[key];
+    }
+    for (key in props) {
+        if (key !== 'style') {
+            node[key] = props[key];
+        }
+    }
+    node.children.forEach(function(child) {
+        child.parentNode = child.parentElement = node;
+    });
+    return node;
+}
+"""
+
+
+def run_script(script, setup, args, result='result'):
+    """Run one of the driver's scripts with node
+
+    :param script: The script to run
+    :param setup: JavaScript that creates the elements using ``el()``
+    :param args: JavaScript expression for the list of script arguments
+    :param result: JavaScript expression for what to return once the script
+                   has run. By default the result of the script itself.
+    :returns: The JSON decoded value of :attr:`result`
+    """
+    program = _DOM + setup + """
+var result = (new Function(%s)).apply(null, %s);
+process.stdout.write(JSON.stringify(%s));
+""" % (json.dumps(script), args, result)
+    process = subprocess.Popen(
+        [NODE], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    out, _ = process.communicate(program.encode('utf-8'))
+    return json.loads(out.decode('utf-8'))
+
 
 def suite():
     """Define all the tests of the module."""
     suite = unittest.TestSuite()
-    suite.addTest(unittest.makeSuite(SeElementsTestCase))
+    load = unittest.defaultTestLoader.loadTestsFromTestCase
+    suite.addTest(load(SeElementsTestCase))
+    suite.addTest(load(ScriptTestCase))
     return suite
 
 
 class SeElementsTestCase(unittest.TestCase):
 
-    def test_init_items_are_loaded_by_default(self):
+    @patch.object(SeElements, 'update', return_value=True)
+    def test_init_items_are_loaded_by_default(self, mock_update):
+        SeElements(None, context=None, fn='.foo')
+        self.assertTrue(mock_update.called)
+
+    @patch.object(SeElements, 'update', return_value=True)
+    def test_init_items_can_be_lazy_loaded(self, mock_update):
+        SeElements(None, context=None, fn='.foo', lazy=True)
+        self.assertFalse(mock_update.called)
+
+    @patch.object(SeElements, 'update', return_value=True)
+    def test_update_is_called_on_first_access(self, mock_update):
+        e = SeElements(None, context=None, fn='.foo', lazy=True)
+        self.assertFalse(mock_update.called)
+
+        # Get the items
+        e.items
+
+        # Should be called
+        self.assertTrue(mock_update.called)
+
+    def test_find_uses_one_script_for_all_contexts(self):
+        browser = MagicMock()
+        parents = [MagicMock(), MagicMock()]
+        browser.execute_script.return_value = ['a', 'b']
+        se = SeElements(browser, fn=lambda context: parents)
+
+        found = se.find('.foo')
+
+        self.assertEqual(found.items, ['a', 'b'])
+        browser.execute_script.assert_called_once_with(
+            se_module._FIND_SCRIPT, parents, '.foo', True)
+
+    def test_find_by_id_uses_the_css_query(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = []
+        SeElements(browser).find('#foo-bar')
+        browser.execute_script.assert_called_once_with(
+            se_module._FIND_SCRIPT, [None], '#foo-bar', True)
+
+    def test_find_treats_browser_as_document(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = []
+        SeElements(browser).xpath('//a', only_displayed=False)
+        browser.execute_script.assert_called_once_with(
+            se_module._XPATH_SCRIPT, [None], '//a', False)
+
+    def test_click_batches_and_falls_back_for_failed_elements(self):
+        browser = MagicMock()
+        items = [MagicMock(), MagicMock()]
+        browser.execute_script.return_value = [1]
+        se = SeElements(browser, fn=lambda context: items)
+
+        se.click()
+
+        browser.execute_script.assert_called_once_with(
+            se_module._CLICK_SCRIPT, items)
+        self.assertFalse(items[0].click.called)
+        items[1].click.assert_called_once_with()
+
+    def test_write_with_special_keys_is_not_batched(self):
+        browser = MagicMock()
+        items = [MagicMock(), MagicMock()]
+        se = SeElements(browser, fn=lambda context: items)
+
+        se.write(u'foo\ue007')
+
+        self.assertFalse(browser.execute_script.called)
+        for item in items:
+            item.send_keys.assert_called_once_with(u'foo\ue007')
+
+    def test_filter_only_keeps_matching_elements(self):
+        se = SeElements(MagicMock(), fn=lambda context: [1, 2, 3, 4])
+        filtered = se.filter(lambda e: e.item % 2 == 0)
+        self.assertEqual(filtered.items, [2, 4])
+
+    def test_closest_uses_one_script(self):
+        browser = MagicMock()
+        items = [MagicMock(), MagicMock()]
+        browser.execute_script.return_value = ['a']
+        se = SeElements(browser, fn=lambda context: items)
+
+        self.assertEqual(se.closest('.foo').items, ['a'])
+        browser.execute_script.assert_called_once_with(
+            se_module._CLOSEST_SCRIPT, items, '.foo')
+
+    def test_chain_groups_script_and_action_steps(self):
+        browser = MagicMock()
+        browser.execute_script.side_effect = [
+            {'results': [None, 'hi']}, {'results': ['v']}]
+        se = SeElements(browser)
+
+        with patch.object(se_module, 'ActionChains') as mock_actions:
+            results = se.chain([
+                ('js-click', '.a'), ('text', '.b'), ('keys', 'x'),
+                ('value', '.c')], ttl=1)
+
+        self.assertEqual(results, [None, 'hi', None, 'v'])
+        self.assertEqual(browser.execute_script.call_count, 2)
+        mock_actions.return_value.send_keys.assert_called_once_with('x')
+        mock_actions.return_value.perform.assert_called_once_with()
+
+    def test_chain_raises_for_failed_step(self):
+        browser = MagicMock()
+        browser.execute_async_script.return_value = {
+            'error': 'Timed out', 'step': 1}
+        se = SeElements(browser)
+
+        with self.assertRaises(ScriptError) as context:
+            se.chain([('scroll', 0, 0), ('wait-visible', '.a')], ttl=1)
+        self.assertIn("'wait-visible'", str(context.exception))
+
+        with self.assertRaises(ValueError):
+            se.chain([('nope',)])
+
+    def test_chain_raises_for_timed_out_script(self):
+        browser = MagicMock()
+        browser.execute_async_script.side_effect = TimeoutException('slow')
+        se = SeElements(browser)
+
+        with self.assertRaises(ScriptError) as context:
+            se.chain([('scroll', 0, 0), ('wait-visible', '.a')], ttl=60)
+        self.assertIn('slow', str(context.exception))
+
+    def test_chain_does_not_run_steps_in_the_document_without_elements(self):
+        browser = MagicMock()
+        se = SeElements(browser, fn=lambda context: [])
+
+        with self.assertRaises(ScriptError):
+            se.chain([('js-click', '.a')])
+        self.assertFalse(browser.execute_script.called)
+
+    def test_navigate_skips_loading_current_url(self):
+        browser = MagicMock(current_url='http://example.com/')
+        se = SeElements(browser)
+
+        se.navigate('http://example.com/')
+        self.assertFalse(browser.get.called)
+
+        se.navigate('http://example.com/', force=True)
+        browser.get.assert_called_once_with('http://example.com/')
+
+    def test_navigate_takes_ttl_as_second_positional_argument(self):
+        browser = MagicMock(current_url='http://example.com/')
+        se = SeElements(browser)
+
+        se.navigate('http://example.com/', 30)
+        self.assertFalse(browser.get.called)
+        se.navigate('http://example.com/', 30, True)
+        browser.get.assert_called_once_with('http://example.com/')
+
+    def test_navigate_uses_ttl_as_page_load_timeout(self):
+        browser = MagicMock(
+            spec=['capabilities', 'current_url', 'get',
+                  'set_page_load_timeout'])
+        browser.capabilities = {'timeouts': {'pageLoad': 300000}}
+        se = SeElements(browser)
+
+        se.navigate('http://example.com/', ttl=5)
+        browser.get.assert_called_once_with('http://example.com/')
+        self.assertEqual(
+            [c[0][0] for c in browser.set_page_load_timeout.call_args_list],
+            [5, 300])
+
+    def test_navigate_restores_the_page_load_timeout_that_was_set(self):
+        browser = MagicMock(
+            spec=['capabilities', 'current_url', 'get',
+                  'set_page_load_timeout'])
+        browser.capabilities = {'timeouts': {'pageLoad': 300000}}
+        se = SeElements(browser).set_page_load_timeout(60)
+
+        se.navigate('http://example.com/', ttl=5)
+        self.assertEqual(
+            [c[0][0] for c in browser.set_page_load_timeout.call_args_list],
+            [60, 5, 60])
+
+    def test_navigate_leaves_an_unknown_page_load_timeout_alone(self):
+        browser = MagicMock(
+            spec=['capabilities', 'current_url', 'get',
+                  'set_page_load_timeout'])
+        browser.capabilities = {}
+        se = SeElements(browser)
+
+        se.navigate('http://example.com/', ttl=5)
+        browser.get.assert_called_once_with('http://example.com/')
+        self.assertFalse(browser.set_page_load_timeout.called)
+
+    def test_navigate_only_retries_connection_errors(self):
+        browser = MagicMock()
+        browser.get.side_effect = [socket.error(), None]
+        se = SeElements(browser)
+
+        se.navigate('http://example.com/')
+        self.assertEqual(2, browser.get.call_count)
+
+        browser.get.side_effect = WebDriverException()
+        with self.assertRaises(WebDriverException):
+            se.navigate('http://example.com/')
+        self.assertEqual(3, browser.get.call_count)
+
+    def test_scroll_waits_for_rendering_instead_of_sleeping(self):
+        browser = MagicMock()
+        se = SeElements(browser)
+
+        se.scroll(0, 10)
+        browser.execute_async_script.assert_called_once_with(
+            se_module._SCROLL_SCRIPT, 0, 10, 250)
+
+        se.scroll(0, 'document.body.scrollHeight', sleep=0)
+        browser.execute_script.assert_called_once_with(
+            se_module._SCROLL_SCRIPT, 0, 'document.body.scrollHeight', 0)
+
+        se.scroll_bottom(sleep=0.5)
+        browser.execute_async_script.assert_called_with(
+            se_module._SCROLL_BOTTOM_SCRIPT, 0, None, 500)
+
+    def test_scroll_ignores_script_timeouts(self):
+        browser = MagicMock()
+        browser.execute_async_script.side_effect = TimeoutException('slow')
+        se = SeElements(browser)
+
+        self.assertIs(se, se.scroll(0, 10))
+        self.assertIs(se, se.scroll_top())
+        self.assertIs(se, se.scroll_bottom())
+
+    def test_read_gets_all_values_in_one_script(self):
+        browser = MagicMock()
+        item = MagicMock()
+        browser.execute_script.return_value = [['foo', 'bar']]
+        se = SeElements(browser, fn=lambda context: [item])
+
+        self.assertEqual(se.read('text', 'value'), ['foo', 'bar'])
+        browser.execute_script.assert_called_once_with(
+            se_module._READ_SCRIPT, [item], ['text', 'value'])
+
+    def test_read_returns_none_without_elements(self):
+        browser = MagicMock()
+        se = SeElements(browser, fn=lambda context: [])
+
+        self.assertEqual(se.read('text', 'value'), [None, None])
+        self.assertFalse(browser.execute_script.called)
+
+    def test_select_uses_script_and_falls_back_to_select(self):
+        browser = MagicMock()
+        item = MagicMock()
+        se = SeElements(browser, fn=lambda context: [item])
+
+        with patch.object(se_module, 'Select') as mock_select:
+            browser.execute_script.return_value = []
+            se.select(value='foo')
+            browser.execute_script.assert_called_once_with(
+                se_module._SELECT_SCRIPT, [item], 'value', 'foo', True)
+            self.assertFalse(mock_select.called)
+
+            browser.execute_script.return_value = [0]
+            se.select(value='foo')
+            mock_select.return_value.select_by_value.assert_called_once_with(
+                'foo')
+
+        with self.assertRaises(ValueError):
+            se.select()
+
+    def test_select_uses_one_script_for_all_elements(self):
+        browser = MagicMock()
+        items = [MagicMock(), MagicMock(), MagicMock()]
+        se = SeElements(browser, fn=lambda context: items)
+        browser.execute_script.return_value = [1]
+
+        with patch.object(se_module, 'Select') as mock_select:
+            se.deselect(i=2)
+        browser.execute_script.assert_called_once_with(
+            se_module._SELECT_SCRIPT, items, 'index', 2, False)
+        mock_select.assert_called_once_with(items[1])
+        mock_select.return_value.deselect_by_index.assert_called_once_with(2)
+
+    def test_get_window_size(self):
+        browser = MagicMock()
+        browser.get_window_size.return_value = {'width': 10, 'height': 20}
+        se = SeElements(browser)
+
+        size = se.get_window_size()
+        self.assertEqual(size, (10, 20))
+        self.assertEqual(size.width, 10)
+
+        browser.get_window_size.side_effect = WebDriverException()
+        self.assertIsNone(se.get_window_size(ttl=0))
+
+        browser.get_window_size.side_effect = KeyError()
+        with self.assertRaises(KeyError):
+            se.get_window_size()
+
+    def test_window_size_is_not_retried_by_default(self):
+        browser = MagicMock()
+        browser.get_window_size.side_effect = WebDriverException()
+        browser.set_window_size.side_effect = WebDriverException()
+        se = SeElements(browser)
+
+        self.assertIsNone(se.get_window_size())
+        self.assertIs(se, se.set_window_size(10, 20))
+        self.assertEqual(1, browser.get_window_size.call_count)
+        self.assertEqual(1, browser.set_window_size.call_count)
+
+    def test_get_window_size_retries_driver_errors(self):
+        browser = MagicMock()
+        browser.get_window_size.side_effect = [
+            WebDriverException(), {'width': 10, 'height': 20}]
+        se = SeElements(browser)
+
+        self.assertEqual(se.get_window_size(ttl=1), (10, 20))
+
+    def test_source_is_only_transferred_when_the_page_changed(self):
+        browser = MagicMock()
+        browser.execute_script.side_effect = ['a', 'a', 'b']
+        browser.page_source = '<html></html>'
+        se = SeElements(browser)
+
+        self.assertEqual('<html></html>', se.source())
+        browser.page_source = '<html>changed</html>'
+        self.assertEqual('<html></html>', se.source())
+        self.assertEqual('<html>changed</html>', se.source())
+
+    def test_source_is_transferred_again_after_refresh(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = 'a'
+        browser.page_source = '<html></html>'
+        se = SeElements(browser)
+
+        se.source()
+        browser.page_source = '<html>changed</html>'
+        se.refresh()
+        self.assertEqual('<html>changed</html>', se.source())
+
+    def test_execute_script_asynchronously(self):
+        browser = MagicMock()
+        browser.execute_async_script.return_value = 42
+        se = SeElements(browser)
+
+        self.assertEqual(
+            42, se.execute_script(
+                'arguments[0](42);', asynchronous=True, ttl=0))
+        browser.execute_async_script.assert_called_once_with(
+            'arguments[0](42);')
+        self.assertFalse(browser.execute_script.called)
+
+    def test_execute_script_accepts_deprecated_async_parameter(self):
+        browser = MagicMock()
+        se = SeElements(browser)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            se.execute_script('arguments[0]();', ttl=0, **{'async': True})
+        self.assertTrue(browser.execute_async_script.called)
+        self.assertEqual(DeprecationWarning, caught[0].category)
+
+        with self.assertRaises(TypeError):
+            se.execute_script('return 1;', foo=True)
+
+    def test_elements_do_not_have_an_instance_dict(self):
+        se = SeElements(MagicMock())
+
+        self.assertFalse(hasattr(se, '__dict__'))
+        with self.assertRaises(AttributeError):
+            se.foo = 'bar'
+
+    def test_find_with_wait_polls_in_the_browser(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = []
+        browser.execute_async_script.return_value = ['a']
+        se = SeElements(browser)
+
+        found = se.find('.foo', wait=True, ttl=2)
+        self.assertEqual(['a'], found.items)
+        args = browser.execute_async_script.call_args[0]
+        self.assertEqual(
+            se_module._WAIT_SCRIPT_TEMPLATE % se_module._FIND_SCRIPT, args[0])
+        self.assertEqual(([None], '.foo', True, 2000), args[1:])
+
+    def test_find_with_wait_only_waits_in_the_browser_once(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = []
+        browser.execute_async_script.return_value = ['a']
+        se = SeElements(browser)
+
+        found = se.find('.foo', wait=True, ttl=2)
+        browser.execute_script.return_value = []
+        found.update()
+        self.assertEqual([], found.items)
+        self.assertEqual(1, browser.execute_async_script.call_count)
+        self.assertEqual(2, browser.execute_script.call_count)
+
+    def test_find_with_wait_skips_the_browser_wait_if_found(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = ['a']
+        se = SeElements(browser)
+
+        self.assertEqual(['a'], se.find('.foo', wait=True, ttl=2).items)
+        self.assertFalse(browser.execute_async_script.called)
+
+    def test_find_with_wait_falls_back_to_polling(self):
+        browser = MagicMock()
+        browser.execute_script.side_effect = [[], ['a']]
+        browser.execute_async_script.side_effect = \
+            WebDriverException('script timeout')
+        se = SeElements(browser)
+
+        self.assertEqual(['a'], se.find('.foo', wait=True, ttl=2).items)
+
+    def test_find_with_wait_only_polls_for_the_rest_of_the_ttl(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = []
+        browser.execute_async_script.return_value = []
+        se = SeElements(browser)
+
+        with patch.object(se_module, 'monotonic', side_effect=[10, 11.5]), \
+                patch.object(SeElements, 'until') as mock_until:
+            se.find('.foo', wait=True, ttl=2)
+        self.assertEqual(0.5, mock_until.call_args[1]['ttl'])
+
+        with patch.object(se_module, 'monotonic', side_effect=[10, 12]):
+            with self.assertRaises(TimeOutError):
+                se.find('.bar', wait=True, ttl=2)
+
+    def test_read_all_reads_every_element_in_one_call(self):
+        browser = MagicMock()
+        se = SeElements(browser, fn=lambda context: ['a', 'b'])
+        browser.execute_script.return_value = [['x', 1], ['y', 2]]
+
+        self.assertEqual([['x', 1], ['y', 2]], se.read_all('text', 'value'))
+        browser.execute_script.assert_called_once_with(
+            se_module._READ_SCRIPT, ['a', 'b'], ['text', 'value'])
+
+    def test_attribute_all_reads_every_element_in_one_call(self):
+        browser = MagicMock()
+        se = SeElements(browser, fn=lambda context: ['a', 'b'])
+        browser.execute_script.return_value = [['x'], ['y']]
+
+        self.assertEqual(['x', 'y'], se.attribute_all('href'))
+        browser.execute_script.assert_called_once_with(
+            se_module._READ_SCRIPT, ['a', 'b'], ['href'])
+
+    def test_scroll_and_find_uses_one_script(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = ['a']
+        se = SeElements(browser)
+
+        found = se.scroll_and_find('.item')
+        self.assertEqual(['a'], found.items)
+        browser.execute_script.assert_called_once_with(
+            se_module._SCROLL_AND_FIND_SCRIPT, [None], '.item', True, 0, None)
+
+    def test_retried_without_ttl_calls_function_directly(self):
+        se = SeElements(MagicMock())
+        fn = MagicMock(side_effect=WebDriverException())
+
+        with patch.object(se_module, '_RETRY_WAITER') as mock_waiter:
+            with self.assertRaises(WebDriverException):
+                se.retried(fn, update=False, ttl=0)
+            self.assertFalse(mock_waiter.wait.called)
+
+            se.retried(fn, update=False, ttl=3)
+            mock_waiter.wait.assert_called_once_with(fn, ttl=3)
+
+    def test_filter_by_js_uses_one_script(self):
+        browser = MagicMock()
+        se = SeElements(browser, fn=lambda context: ['a', 'b'])
+        browser.execute_script.return_value = ['b']
+
+        filtered = se.filter_by_js('el.disabled')
+        self.assertEqual(['b'], filtered.items)
+        browser.execute_script.assert_called_once_with(
+            se_module._FILTER_SCRIPT_TEMPLATE % 'el.disabled', ['a', 'b'])
+
+    def test_run_calls_the_function(self):
+        se = SeElements(MagicMock())
+        fn = MagicMock(side_effect=[WebDriverException(), 42])
+
+        self.assertEqual(42, se.run(fn, ttl=1))
+        self.assertEqual(2, fn.call_count)
+
+    def test_queries_can_be_cached_until_update(self):
+        browser = MagicMock()
+        browser.execute_script.return_value = ['a']
+        se = SeElements(browser)
+        self.assertIsNot(se.find('.foo'), se.find('.foo'))
+
+        se = SeElements(browser, config={'cache_queries': True})
+        found = se.find('.foo')
+        self.assertIs(found, se.find('.foo'))
+        self.assertIsNot(found, se.find('.bar'))
+
+        se.update()
+        self.assertIsNot(found, se.find('.foo'))
+
+    def test_foreach_runs_batchable_functions_in_one_script(self):
+        browser = MagicMock()
+        se = SeElements(browser, fn=lambda context: ['a', 'b'])
+        browser.execute_script.return_value = ['x', 'y']
+        fn = batchable('return el.id;')(MagicMock())
+
+        self.assertEqual(['x', 'y'], se.foreach(fn, return_results=True))
+        browser.execute_script.assert_called_once_with(
+            se_module._BATCH_SCRIPT_TEMPLATE % 'return el.id;', ['a', 'b'])
+        self.assertFalse(fn.called)
+
+    def test_derived_elements_keep_the_subclass(self):
+        class MyElements(SeElements):
+            __slots__ = ()
+        browser = MagicMock()
+        browser.execute_script.return_value = ['a']
+        se = MyElements(browser)
+
+        found = se.find('.foo')
+        self.assertIsInstance(found, MyElements)
+        self.assertIsInstance(found[0], MyElements)
+
+
+@unittest.skipIf(NODE is None, "node is required to run the scripts")
+class ScriptTestCase(unittest.TestCase):
+
+    def test_write_script_only_sets_the_value_of_text_fields(self):
+        setup = """
+var fields = [
+    el('input', {type: 'text', value: 'a'}),
+    el('textarea', {type: 'textarea', value: 'a'}),
+    el('select', {type: 'select-one', value: 'a'}),
+    el('input', {type: 'checkbox', value: 'a'}),
+    el('button', {type: 'submit', value: 'a'}),
+    el('input', {type: 'text', value: 'a', maxLength: 2})
+];
+"""
+        self.assertEqual(
+            [2, 3, 4, 5],
+            run_script(se_module._WRITE_SCRIPT, setup, "[fields, 'bc', false]"))
+        self.assertEqual(
+            ['abc', 'abc', 'a', 'a', 'a', 'a'],
+            run_script(
+                se_module._WRITE_SCRIPT, setup, "[fields, 'bc', false]",
+                "fields.map(function(f) { return f.value; })"))
 
-        with patch.object(SeElements, 'update',
-                          return_value=True) as mock_update:
-            SeElements(None, context=None, fn='.foo')
-            self.assertTrue(mock_update.called)
+    def test_write_script_uses_the_native_value_setter(self):
+        # Like React, track the value with a setter on the element itself
+        setup = """
+var field = el('input', {type: 'text'});
+delete field.value;
+Object.setPrototypeOf(field, {
+    set value(value) { this.nativeValue = value; },
+    get value() { return this.nativeValue || ''; }
+});
+Object.defineProperty(field, 'value', {
+    set: function(value) { this.tracked = value; },
+    get: function() { return this.nativeValue || ''; }
+});
+"""
+        self.assertEqual(
+            ['abc', None],
+            run_script(
+                se_module._WRITE_SCRIPT, setup, "[[field], 'abc', false]",
+                "[field.nativeValue, field.tracked || null]"))
 
-    def test_init_items_can_be_lazy_loaded(self):
+    def is_displayed(self, setup, target):
+        return run_script(
+            se_module._IS_DISPLAYED_SCRIPT +
+            "return isDisplayed(arguments[0]);", setup, "[%s]" % target)
 
-        with patch.object(SeElements, 'update',
-                          return_value=True) as mock_update:
-            SeElements(None, context=None, fn='.foo', lazy=True)
-            self.assertFalse(mock_update.called)
+    def test_options_are_displayed_if_their_select_is(self):
+        setup = """
+var option = el('option', {rect: {left: 0, top: 0, right: 0, bottom: 0,
+                                  width: 0, height: 0}});
+var group = el('optgroup', {rect: option.rect}, [option]);
+var select = el('select', {}, [group]);
+var hidden = el('option', {rect: option.rect});
+el('select', {style: {display: 'none'}}, [hidden]);
+"""
+        self.assertTrue(self.is_displayed(setup, 'option'))
+        self.assertTrue(self.is_displayed(setup, 'group'))
+        self.assertFalse(self.is_displayed(setup, 'hidden'))
 
-    def test_update_is_called_on_first_access(self):
+    def test_zero_size_elements_with_visible_children_are_displayed(self):
+        setup = """
+var empty = {left: 0, top: 0, right: 0, bottom: 0, width: 0, height: 0};
+var parent = el('a', {rect: empty}, [el('span')]);
+var nothing = el('a', {rect: empty}, [el('span', {rect: empty})]);
+"""
+        self.assertTrue(self.is_displayed(setup, 'parent'))
+        self.assertFalse(self.is_displayed(setup, 'nothing'))
 
-        with patch.object(SeElements, 'update',
-                          return_value=True) as mock_update:
-            e = SeElements(None, context=None, fn='.foo', lazy=True)
-            self.assertFalse(mock_update.called)
+    def test_elements_clipped_by_overflow_are_not_displayed(self):
+        setup = """
+var inside = el('span');
+var outside = el('span', {rect: {left: 0, top: 20, right: 10, bottom: 30,
+                                 width: 10, height: 10}});
+var scrolled = el('span', {rect: outside.rect});
+el('div', {style: {overflowX: 'hidden', overflowY: 'hidden'}},
+   [inside, outside]);
+el('div', {style: {overflowX: 'auto', overflowY: 'auto'}}, [scrolled]);
+"""
+        self.assertTrue(self.is_displayed(setup, 'inside'))
+        self.assertFalse(self.is_displayed(setup, 'outside'))
+        self.assertTrue(self.is_displayed(setup, 'scrolled'))
 
-            # Get the items
-            e.items
+    def test_find_script_returns_every_displayed_match_of_an_id(self):
+        setup = """
+var hidden = el('p', {id: 'foo', style: {display: 'none'}});
+var first = el('p', {id: 'foo', name: 'first'});
+var second = el('p', {id: 'foo', name: 'second'});
+var queries = [];
+global.document = {
+    querySelectorAll: function(selector) {
+        queries.push(selector);
+        return [hidden, first, second];
+    }
+};
+"""
+        self.assertEqual(
+            [['first', 'second'], ['#foo']],
+            run_script(
+                se_module._FIND_SCRIPT, setup, "[[null], '#foo', true]",
+                "[result.map(function(r) { return r.name; }), queries]"))
 
-            # Should be called
-            self.assertTrue(mock_update.called)
+    def test_xpath_script_caches_a_bounded_number_of_expressions(self):
+        setup = """
+var compiled = 0;
+global.XPathResult = {ORDERED_NODE_SNAPSHOT_TYPE: 7};
+global.document = {
+    createExpression: function(selector) {
+        compiled++;
+        return {evaluate: function() {
+            return {snapshotLength: 0};
+        }};
+    }
+};
+var xpath = new Function(%s);
+for (var i = 0; i < 150; i++) {
+    xpath([null], '//p' + i, false);
+}
+xpath([null], '//p149', false);
+""" % json.dumps(se_module._XPATH_SCRIPT)
+        self.assertEqual(
+            [150, 100],
+            run_script(
+                se_module._XPATH_SCRIPT, setup, "[[null], '//p149', false]",
+                "[compiled, window.__ecache.size]"))
 
 
 if __name__ == '__main__':
@@ -6,7 +6,8 @@ __email__ = "prschmid@act.md"
 
 import unittest
 
-from mock import patch
+from mock import MagicMock, patch
+from six.moves import collections_abc
 
 from elementium.elements import Elements
 
@@ -14,58 +15,181 @@ from elementium.elements import Elements
 def suite():
     """Define all the tests of the module."""
     suite = unittest.TestSuite()
-    suite.addTest(unittest.makeSuite(ElementsTestCase))
+    load = unittest.defaultTestLoader.loadTestsFromTestCase
+    suite.addTest(load(ElementsTestCase))
     return suite
 
 
-class ElementsTestImpl(Elements):
-    def get(self, i): pass
-    def retried(self, fn, update=True, ttl=None): pass
-    def is_displayed(self, ttl=None): pass
-    def is_enabled(self, ttl=None): pass
-    def is_selected(self, ttl=None): pass
-    def text(self, ttl=None): pass
-    def tag_name(self, ttl=None): pass
-    def value(self, ttl=None): pass
-    def attribute(self, name, ttl=None): pass
-    def clear(self, ttl=None): pass
-    def click(self, ttl=None): pass
-    def write(self, text, ttl=None): pass
-    def closest(self, selector, ttl=None): pass
-    def parent(self, ttl=None): pass
-    def find(self, selector, ttl=None): pass
-    def xpath(self, selector, ttl=None): pass
-    def filter(self, fn, ttl=None): pass
+def _stub(*args, **kwargs):
+    pass
 
 
-class ElementsTestCase(unittest.TestCase):
-
-    def test_init_items_are_loaded_by_default(self):
-
-        with patch.object(ElementsTestImpl, 'update',
-                          return_value=True) as mock_update:
-            ElementsTestImpl(None, context=None, fn='.foo')
-            self.assertTrue(mock_update.called)
-
-    def test_init_items_can_be_lazy_loaded(self):
+# Implement every abstract method of Elements with a no-op stub
+ElementsTestImpl = type(
+    'ElementsTestImpl', (Elements,),
+    dict((name, _stub) for name in Elements.__abstractmethods__))
 
-        with patch.object(ElementsTestImpl, 'update',
-                          return_value=True) as mock_update:
-            ElementsTestImpl(None, context=None, fn='.foo', lazy=True)
-            self.assertFalse(mock_update.called)
 
-    def test_update_is_called_on_first_access(self):
-
-        with patch.object(ElementsTestImpl, 'update',
-                          return_value=True) as mock_update:
-            e = ElementsTestImpl(None, context=None, fn='.foo', lazy=True)
-            self.assertFalse(mock_update.called)
-
-            # Get the items
-            e.items
+class ElementsTestCase(unittest.TestCase):
 
-            # Should be called
-            self.assertTrue(mock_update.called)
+    @patch.object(ElementsTestImpl, 'update', return_value=True)
+    def test_init_items_are_loaded_by_default(self, mock_update):
+        ElementsTestImpl(None, context=None, fn='.foo')
+        self.assertTrue(mock_update.called)
+
+    @patch.object(ElementsTestImpl, 'update', return_value=True)
+    def test_init_items_can_be_lazy_loaded(self, mock_update):
+        ElementsTestImpl(None, context=None, fn='.foo', lazy=True)
+        self.assertFalse(mock_update.called)
+
+    @patch.object(ElementsTestImpl, 'update', return_value=True)
+    def test_update_is_called_on_first_access(self, mock_update):
+        e = ElementsTestImpl(None, context=None, fn='.foo', lazy=True)
+        self.assertFalse(mock_update.called)
+
+        # Get the items
+        e.items
+
+        # Should be called
+        self.assertTrue(mock_update.called)
+
+    def test_foreach_shares_one_deadline_between_items(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a', 'b', 'c'])
+        item = MagicMock()
+
+        with patch.object(ElementsTestImpl, 'get', return_value=item), \
+                patch('elementium.elements.monotonic',
+                      side_effect=[100, 100, 104, 112]):
+            e.foreach(lambda element: None, ttl=10)
+        self.assertEqual(
+            [c[1]['ttl'] for c in item.retried.call_args_list], [10, 6, 0])
+
+    def test_iterating_wraps_each_item(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a', 'b'])
+
+        with patch.object(ElementsTestImpl, 'get',
+                          side_effect=lambda i: i) as mock_get:
+            self.assertEqual([0, 1], list(e))
+        self.assertEqual(2, mock_get.call_count)
+
+    def test_item_wrappers_are_reused_until_update(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a', 'b'])
+
+        with patch.object(ElementsTestImpl, 'get',
+                          side_effect=lambda i: MagicMock()) as mock_get:
+            self.assertIs(e[0], e[0])
+            self.assertEqual(1, mock_get.call_count)
+
+            e.update()
+            e[0]
+            self.assertEqual(2, mock_get.call_count)
+
+    def test_update_refreshes_contexts_from_the_root_down(self):
+        calls = []
+        def fn(name):
+            def inner(context):
+                calls.append(name)
+                return [name]
+            return inner
+
+        root = ElementsTestImpl(None, fn=fn('root'))
+        child = ElementsTestImpl(None, context=root, fn=fn('child'))
+        leaf = ElementsTestImpl(None, context=child, fn=fn('leaf'))
+        del calls[:]
+
+        leaf.update()
+        self.assertEqual(['root', 'child', 'leaf'], calls)
+
+        del calls[:]
+        leaf.update(propagate=False)
+        self.assertEqual(['leaf'], calls)
+
+    def test_list_methods_act_on_the_raw_items(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a', 'b'])
+
+        with patch.object(ElementsTestImpl, 'get') as mock_get:
+            e.append('c')
+            e.extend(['d'])
+            e += ['e']
+            e.remove('a')
+            self.assertEqual(1, e.index('c'))
+            self.assertEqual(1, e.count('d'))
+            self.assertIn('e', e)
+            self.assertFalse(mock_get.called)
+        self.assertEqual(['b', 'c', 'd', 'e'], e.items)
+
+    def test_foreach_can_retry_without_refetching(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a'])
+        item = MagicMock()
+        fn = MagicMock()
+
+        with patch.object(ElementsTestImpl, 'get', return_value=item):
+            e.foreach(fn, ttl=0, refetch=False)
+        partial, = item.retried.call_args[0]
+        self.assertFalse(item.retried.call_args[1]['update'])
+        partial()
+        fn.assert_called_once_with(item)
+
+    def test_browser_is_the_only_item_without_fn(self):
+        browser = MagicMock()
+        e = ElementsTestImpl(browser)
+
+        self.assertIsNone(e.fn)
+        self.assertEqual([browser], e.items)
+
+    def test_insist_checks_a_met_condition_once(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a'])
+        fn = MagicMock(return_value=True)
+
+        self.assertIs(e, e.insist(fn, ttl=1))
+        fn.assert_called_once_with(e)
+
+    def test_insist_asserts_an_unmet_condition(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a'])
+
+        self.assertRaises(AssertionError, e.insist, lambda e: False, ttl=0.1)
+
+    def test_pop_returns_the_wrapped_item(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a', 'b'])
+        wrapper = MagicMock()
+
+        with patch.object(ElementsTestImpl, 'get', return_value=wrapper) as \
+                mock_get:
+            self.assertIs(wrapper, e.pop())
+        mock_get.assert_called_once_with(-1)
+        self.assertEqual(['a'], e.items)
+
+    def test_set_items_drops_the_wrappers(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a'])
+        e._wrappers[0] = MagicMock()
+
+        self.assertIs(e, e._set_items(['b']))
+        self.assertEqual(['b'], e.items)
+        self.assertEqual({}, e._wrappers)
+
+    def test_cached_elements_are_not_updated_until_invalidated(self):
+        fn = MagicMock(side_effect=[['a'], ['b'], ['c']])
+        e = ElementsTestImpl(None, fn=fn).cache()
+
+        e.update()
+        self.assertEqual(['a'], e.items)
+        e.invalidate()
+        self.assertEqual(['b'], e.items)
+        e.update()
+        self.assertEqual(['c'], e.items)
+
+    def test_elements_are_a_mutable_sequence(self):
+        e = ElementsTestImpl(None, fn=lambda context: ['a'])
+
+        self.assertIsInstance(e, collections_abc.MutableSequence)
+
+    def test_empty_items_are_not_fetched_again(self):
+        fn = MagicMock(return_value=[])
+        e = ElementsTestImpl(None, fn=fn)
+
+        self.assertEqual([], e.items)
+        self.assertEqual([], e.items)
+        self.assertEqual(1, fn.call_count)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+from __future__ import absolute_import
+
+__author__ = "Patrick R. Schmid"
+__email__ = "prschmid@act.md"
+
+
+import unittest
+
+from elementium.util import as_exception_tuple
+
+
+def suite():
+    """Define all the tests of the module."""
+    suite = unittest.TestSuite()
+    load = unittest.defaultTestLoader.loadTestsFromTestCase
+    suite.addTest(load(UtilTestCase))
+    return suite
+
+
+class UtilTestCase(unittest.TestCase):
+
+    def test_as_exception_tuple_returns_tuples_as_is(self):
+        exceptions = (ValueError, KeyError)
+
+        self.assertIs(exceptions, as_exception_tuple(exceptions))
+
+    def test_as_exception_tuple_wraps_a_single_exception(self):
+        self.assertEqual((ValueError,), as_exception_tuple(ValueError))
+
+    def test_as_exception_tuple_wraps_base_exceptions(self):
+        self.assertEqual(
+            (KeyboardInterrupt,), as_exception_tuple(KeyboardInterrupt))
+        self.assertEqual(
+            (BaseException,), as_exception_tuple(BaseException))
+
+    def test_as_exception_tuple_converts_iterables(self):
+        self.assertEqual(
+            (ValueError, KeyboardInterrupt),
+            as_exception_tuple([ValueError, KeyboardInterrupt]))
+        self.assertEqual(
+            (ValueError,), as_exception_tuple(e for e in [ValueError]))
+        self.assertEqual((), as_exception_tuple([]))
+
+    def test_as_exception_tuple_can_be_used_in_except(self):
+        try:
+            raise KeyError('foo')
+        except as_exception_tuple([ValueError, KeyError]):
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
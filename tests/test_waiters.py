@@ -4,12 +4,13 @@ __author__ = "Patrick R. Schmid"
 __email__ = "prschmid@act.md"
 
 
-import time
 import unittest
 
-from mock import MagicMock
+from mock import MagicMock, patch
 
+from elementium.elements import Elements
 from elementium.exc import TimeOutError
+from elementium.util import DEFAULT_MAX_PAUSE
 from elementium.waiters import (
     ConditionElementsWaiter,
     ExceptionRetryWaiter,
@@ -21,13 +22,39 @@ from elementium.waiters import (
 def suite():
     """Define all the tests of the module."""
     suite = unittest.TestSuite()
-    suite.addTest(unittest.makeSuite(WaiterTestCase))
-    suite.addTest(unittest.makeSuite(ExceptionRetryWaiterTestCase))
-    suite.addTest(unittest.makeSuite(ExceptionRetryElementsWaiterTestCase))
-    suite.addTest(unittest.makeSuite(ConditionElementsWaiterTestCase))
+    load = unittest.defaultTestLoader.loadTestsFromTestCase
+    suite.addTest(load(WaiterTestCase))
+    suite.addTest(load(ExceptionRetryWaiterTestCase))
+    suite.addTest(load(ExceptionRetryElementsWaiterTestCase))
+    suite.addTest(load(ConditionElementsWaiterTestCase))
     return suite
 
 
+class FakeClock(object):
+    """Replace the waiters' clock with one that only moves when sleeping"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._patches = [
+            patch('elementium.waiters.monotonic', self.monotonic),
+            patch('elementium.waiters.time.sleep', self.sleep)]
+
+    def __enter__(self):
+        for p in self._patches:
+            p.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for p in reversed(self._patches):
+            p.stop()
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
 class WaiterTestImpl(Waiter):
     def wait(self, n=0, ttl=None, **kwargs):
         raise NotImplementedError()
@@ -47,22 +74,53 @@ class WaiterTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             WaiterTestImpl(n=-1, ttl=1)
 
-    def test_check_args_with_none_arguments(self):
-        w = WaiterTestImpl()
-        with self.assertRaises(ValueError):
-            w._check_args(n=-1, ttl=-1)
-        with self.assertRaises(ValueError):
-            w._check_args(n=-1, ttl=None)
-        with self.assertRaises(ValueError):
-            w._check_args(n=None, ttl=-1)
+    def test_cannot_set_invalid_backoff(self):
         with self.assertRaises(ValueError):
-            w._check_args(n=None, ttl=None)
+            WaiterTestImpl(max_pause=-1)
         with self.assertRaises(ValueError):
-            w._check_args(n=0, ttl=0)
-
-    def test_check_args_with_both_arguments_set(self):
-        with self.assertRaises(ValueError):
-            WaiterTestImpl()._check_args(n=1, ttl=1)
+            WaiterTestImpl(jitter=1)
+
+    def test_backoff_doubles_pause_up_to_max_pause(self):
+        w = WaiterTestImpl(pause=1, max_pause=3, jitter=0)
+        with patch('elementium.waiters.time.sleep') as mock_sleep:
+            self.assertEqual(w._backoff(1), 2)
+            self.assertEqual(w._backoff(2), 3)
+            self.assertEqual(w._backoff(3), 3)
+        self.assertEqual(
+            [c[0][0] for c in mock_sleep.call_args_list], [1, 2, 3])
+
+    def test_backoff_is_capped_by_default(self):
+        w = WaiterTestImpl(pause=1)
+        with patch('elementium.waiters.time.sleep'):
+            self.assertEqual(w._backoff(1), DEFAULT_MAX_PAUSE)
+
+    def test_backoff_applies_jitter(self):
+        w = WaiterTestImpl(pause=1, jitter=0.5)
+        with patch('elementium.waiters.time.sleep') as mock_sleep:
+            w._backoff(1)
+        slept = mock_sleep.call_args[0][0]
+        self.assertGreaterEqual(slept, 0.5)
+        self.assertLessEqual(slept, 1.5)
+
+    def test_backoff_does_not_sleep_past_the_deadline(self):
+        w = WaiterTestImpl(pause=1)
+        with patch('elementium.waiters.monotonic', return_value=10), \
+                patch('elementium.waiters.time.sleep') as mock_sleep:
+            w._backoff(1, etime=10.25)
+            w._backoff(1, etime=9)
+        self.assertEqual(
+            [c[0][0] for c in mock_sleep.call_args_list], [0.25, 0])
+
+    def test_check_args_rejects_invalid_arguments(self):
+        w = WaiterTestImpl()
+        for n, ttl in [
+                # Neither set
+                (None, None), (0, 0),
+                # Both set
+                (1, 1),
+                # Negative values
+                (-1, -1), (-1, None), (None, -1), (1, -1), (-1, 1)]:
+            self.assertRaises(ValueError, w._check_args, n=n, ttl=ttl)
 
     def test_check_args_with_valid_arguments(self):
         w = WaiterTestImpl()
@@ -71,17 +129,6 @@ class WaiterTestCase(unittest.TestCase):
         self.assertTrue(w._check_args(n=1, ttl=None))
         self.assertTrue(w._check_args(n=1, ttl=0))
 
-    def test_check_args_does_not_allow_negative_values(self):
-        w = WaiterTestImpl()
-        with self.assertRaises(ValueError):
-            w._check_args(n=None, ttl=-1)
-        with self.assertRaises(ValueError):
-            w._check_args(n=-1, ttl=None)
-        with self.assertRaises(ValueError):
-            w._check_args(n=1, ttl=-1)
-        with self.assertRaises(ValueError):
-            w._check_args(n=-1, ttl=1)
-
 
 class ExceptionRetryWaiterMixin(object):
 
@@ -102,12 +149,11 @@ class ExceptionRetryWaiterMixin(object):
 
     def test_does_retry_for_registered_exception_with_ttl_retries(self):
         f = MagicMock(side_effect=TypeError('Oops'))
-        start_time = time.time()
-        with self.assertRaises(TypeError):
-            self.waiter(TypeError).wait(f, ttl=2)
-        end_time = time.time()
+        with FakeClock() as clock:
+            with self.assertRaises(TypeError):
+                self.waiter(TypeError).wait(f, ttl=2)
         self.assertGreater(f.call_count, 1)
-        self.assertGreaterEqual(end_time - start_time, 2)
+        self.assertGreaterEqual(clock.now, 2)
 
     def test_does_retry_for_registered_exceptions(self):
         f1 = MagicMock(side_effect=TypeError('Oops'))
@@ -146,7 +192,10 @@ class ExceptionRetryElementsWaiterTestCase(
         unittest.TestCase, ExceptionRetryWaiterMixin):
 
     def waiter(self, exceptions):
-        return ExceptionRetryElementsWaiter(MagicMock(), exceptions, pause=0.1)
+        # Spec the elements so the waiter can only use the real Elements API
+        elements = MagicMock(spec=Elements)
+        elements.__len__.return_value = 1
+        return ExceptionRetryElementsWaiter(elements, exceptions, pause=0.1)
 
     def test_does_raises_exception_if_waiter_never_run(self):
 
@@ -160,9 +209,28 @@ class ExceptionRetryElementsWaiterTestCase(
             waiter.wait(MagicMock(side_effect=TypeError('Oops')), ttl=0, n=0)
         self.assertIn("Waiter was never run.", str(context.exception))
 
+    def test_only_updates_elements_for_update_on_exceptions(self):
+        elements = MagicMock()
+        f = MagicMock(side_effect=[KeyError(), TypeError(), True])
+        waiter = ExceptionRetryElementsWaiter(
+            elements, (KeyError, TypeError), pause=0, update_on=TypeError)
+
+        self.assertTrue(waiter.wait(f, n=3))
+        self.assertEqual(elements.update.call_count, 1)
+
 
 class ConditionElementsWaiterTestCase(unittest.TestCase):
 
+    def test_only_updates_contexts_every_few_retries(self):
+        elements = MagicMock()
+        f = MagicMock(return_value=False)
+        with self.assertRaises(TimeOutError):
+            ConditionElementsWaiter(
+                elements, pause=0, full_update_every=2).wait(f, n=4)
+        self.assertEqual(
+            [c[1]['propagate'] for c in elements.update.call_args_list],
+            [False, True, False, True])
+
     def test_does_retry_if_function_does_not_evaluate_to_true_with_n_retires(self):
         f = MagicMock(return_value=False)
         with self.assertRaises(TimeOutError):
@@ -171,18 +239,28 @@ class ConditionElementsWaiterTestCase(unittest.TestCase):
 
     def test_does_retry_if_function_does_not_evaluate_to_true_with_ttl_retires(self):
         f = MagicMock(return_value=False)
-        start_time = time.time()
-        with self.assertRaises(TimeOutError):
-            ConditionElementsWaiter(MagicMock(), pause=0.1).wait(f, ttl=2)
-        end_time = time.time()
+        with FakeClock() as clock:
+            with self.assertRaises(TimeOutError):
+                ConditionElementsWaiter(MagicMock(), pause=0.1).wait(f, ttl=2)
         self.assertGreaterEqual(f.call_count, 1)
-        self.assertGreaterEqual(end_time - start_time, 2)
+        self.assertGreaterEqual(clock.now, 2)
 
     def test_does_not_retry_if_function_evaluates_to_true(self):
         f = MagicMock(return_value=True)
         ConditionElementsWaiter(MagicMock(), pause=0.1).wait(f, n=2)
         self.assertEqual(f.call_count, 1)
 
+    def test_timeout_reason_is_the_source_of_the_condition(self):
+        def never(elements): return False
+        waiter = ConditionElementsWaiter(MagicMock(), pause=0)
+        with patch('elementium.waiters.inspect.getsource',
+                   return_value='  never  ') as mock_getsource:
+            for _ in range(2):
+                with self.assertRaises(TimeOutError) as cm:
+                    waiter.wait(never, n=1)
+                self.assertEqual('never', str(cm.exception))
+        self.assertEqual(1, mock_getsource.call_count)
+
 
 if __name__ == '__main__':
     unittest.main()